@@ -0,0 +1,153 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Helpers ------------------------------------------------------------------------------------------
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(size):
+    size = str(size).strip().upper().rstrip("B")
+    unit = size[-1] if size and size[-1] in _SIZE_UNITS else ""
+    return int(float(size[: len(size) - len(unit)]) * _SIZE_UNITS[unit])
+
+
+def _directory_size(path):
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            size += os.path.getsize(os.path.join(root, f))
+    return size
+
+
+@lru_cache(maxsize=None)
+def git_revision(path):
+    # Commit of a checkout, with a digest of its local modifications (if any) so that a dirty
+    # working tree never shares cache entries with the commit it is based on.
+    if not os.path.exists(path):
+        return "none"
+    revision = subprocess.check_output(
+        ["git", "-C", path, "rev-parse", "HEAD"], text=True
+    ).strip()
+    diff = subprocess.check_output(["git", "-C", path, "diff", "HEAD"])
+    if diff:
+        revision += "-dirty-" + hashlib.sha256(diff).hexdigest()[:16]
+    return revision
+
+
+# NetlistCache -------------------------------------------------------------------------------------
+
+# Content-addressed cache of generator outputs (PythonArgsGen parameters, SocGen netlists).
+#
+# Each entry is a directory named after the hash of every generator input, the index
+# (index.json) records entry sizes and last-used times and the cache is evicted (LRU) down to
+# max_size. All index updates are done under a lock file so that the cache directory can be
+# shared (e.g. over NFS) by several build machines.
+#
+# Builds use entries in place (the netlist is read by the toolchain long after its lookup): entries
+# looked up or stored less than `lease` seconds ago are never evicted, the cache may then exceed
+# max_size until they expire.
+
+
+class NetlistCache:
+    def __init__(self, directory, max_size, lease=24 * 3600):
+        # Absolute: generators write to staging() from the VexiiRiscv checkout (cd).
+        self.directory = directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self.lease = lease
+        self.entries_dir = os.path.join(directory, "entries")
+        self.index_file = os.path.join(directory, "index.json")
+        os.makedirs(self.entries_dir, exist_ok=True)
+
+    @staticmethod
+    def key(*inputs):
+        sha256_hash = hashlib.sha256()
+        for i in inputs:
+            sha256_hash.update(str(i).encode("utf-8"))
+            sha256_hash.update(b"\0")
+        return sha256_hash.hexdigest()
+
+    @contextmanager
+    def _locked_index(self):
+        with open(os.path.join(self.directory, "index.lock"), "w") as lock:
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                yield index
+                tmp = self.index_file + f".{os.getpid()}"
+                with open(tmp, "w") as f:
+                    json.dump(index, f, indent=1)
+                os.replace(tmp, self.index_file)
+            finally:
+                fcntl.lockf(lock, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                index = json.load(f)
+        else:
+            index = {}
+        # Re-sync with entries on disk (deleted by hand, or index lost).
+        on_disk = set(os.listdir(self.entries_dir))
+        index = {k: v for k, v in index.items() if k in on_disk}
+        for k in on_disk - set(index):
+            path = os.path.join(self.entries_dir, k)
+            index[k] = {"size": _directory_size(path), "last_used": 0}
+        return index
+
+    def path(self, key):
+        return os.path.join(self.entries_dir, key)
+
+    def lookup(self, key):
+        with self._locked_index() as index:
+            if key not in index:
+                return None
+            index[key]["last_used"] = time.time()
+        return self.path(key)
+
+    def staging(self):
+        # Temporary directory on the same filesystem as the entries (atomic rename on store).
+        return tempfile.mkdtemp(prefix="staging-", dir=self.directory)
+
+    def store(self, key, staging, replace=False):
+        with self._locked_index() as index:
+            path = self.path(key)
+            if os.path.exists(path) and not replace:
+                # Generated concurrently by another build, keep the entry it may be using.
+                shutil.rmtree(staging)
+            else:
+                if os.path.exists(path):
+                    shutil.rmtree(path)
+                os.rename(staging, path)
+            index[key] = {"size": _directory_size(path), "last_used": time.time()}
+            self._evict(index, keep=key)
+        return path
+
+    def _evict(self, index, keep):
+        total = sum(e["size"] for e in index.values())
+        leased = time.time() - self.lease
+        for k in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_size:
+                break
+            if k == keep or index[k]["last_used"] > leased:
+                # In use by this build, or possibly by another one.
+                continue
+            print(f"Evicting netlist cache entry {k}.")
+            shutil.rmtree(self.path(k), ignore_errors=True)
+            total -= index.pop(k)["size"]
+        if total > self.max_size:
+            print("Netlist cache over its size limit, entries in use kept.")
@@ -0,0 +1,101 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import ast
+import json
+from dataclasses import dataclass, fields, asdict
+
+# VexiiConfig --------------------------------------------------------------------------------------
+
+# CPU parameters produced by PythonArgsGen.
+#
+# PythonArgsGen emits a Python file made of `VexiiRiscv.<name> = <literal>` assignments. It is
+# parsed (never executed) into this immutable object, stored as JSON next to it in the netlist
+# cache and memoized per cache key, so repeated builds in one process load it once and parallel
+# workers can receive it without relying on VexiiRiscv class attributes.
+
+
+@dataclass(frozen=True)
+class VexiiConfig:
+    xlen: int = 32
+    with_rvm: bool = False
+    with_rva: bool = False
+    with_rvf: bool = False
+    with_rvd: bool = False
+    with_rvc: bool = False
+    with_rvcbom: bool = False
+    with_lsu_software_prefetch: bool = False
+    with_lsu_hardware_prefetch: str = "none"
+    internal_bus_width: int = 32
+    # Parameters not modelled above, as sorted (name, value) pairs.
+    extra: tuple = ()
+
+    @classmethod
+    def from_params(cls, source, filename="<params>"):
+        params = {}
+        for node in ast.parse(source, filename).body:
+            target = None
+            if isinstance(node, ast.Assign) and len(node.targets) == 1:
+                target = node.targets[0]
+            if not (
+                isinstance(target, ast.Attribute)
+                and isinstance(target.value, ast.Name)
+                and target.value.id == "VexiiRiscv"
+            ):
+                raise ValueError(
+                    f"{filename}:{node.lineno}: unexpected statement in PythonArgsGen output."
+                )
+            params[target.attr] = ast.literal_eval(node.value)
+        return cls.from_dict(params)
+
+    @classmethod
+    def from_dict(cls, params):
+        kwargs = {}
+        extra = []
+        types = {f.name: f.type for f in fields(cls) if f.name != "extra"}
+        for name, value in params.items():
+            if name in types:
+                kwargs[name] = types[name](value)
+            elif name == "extra":
+                extra += [tuple(e) for e in value]
+            else:
+                extra.append((name, value))
+        return cls(extra=tuple(sorted(extra)), **kwargs)
+
+    def to_json(self):
+        return json.dumps(asdict(self), indent=1)
+
+    # Set the parameters on the CPU class (read by get_arch/get_abi/gcc_flags).
+    def apply(self, cpu_cls):
+        for f in fields(self):
+            if f.name != "extra":
+                setattr(cpu_cls, f.name, getattr(self, f.name))
+        for name, value in self.extra:
+            setattr(cpu_cls, name, value)
+
+
+# Loader -------------------------------------------------------------------------------------------
+
+_configs = {}
+
+
+def params_to_json(directory):
+    # Convert a PythonArgsGen output directory (params.py) to params.json.
+    with open(os.path.join(directory, "params.py")) as f:
+        config = VexiiConfig.from_params(f.read(), f.name)
+    with open(os.path.join(directory, "params.json"), "w") as f:
+        f.write(config.to_json())
+
+
+def load_config(key, directory):
+    if key not in _configs:
+        json_file = os.path.join(directory, "params.json")
+        if not os.path.exists(json_file):
+            params_to_json(directory)
+        with open(json_file) as f:
+            _configs[key] = VexiiConfig.from_dict(json.load(f))
+    return _configs[key]
@@ -6,15 +6,33 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 import os
-import subprocess
 import re
-import hashlib
+import json
+import shutil
+import subprocess
+from contextlib import nullcontext
 
 from migen import *
 
+from litex.soc.cores.cpu import CPU_GCC_TRIPLE_RISCV32, CPU_GCC_TRIPLE_RISCV64
 from litex.soc.cores.cpu.naxriscv import NaxRiscv
 
 from litex.soc.cores.cpu.vexiiriscv import VexiiRiscv
+from litex.soc.interconnect import wishbone
+from litex.soc.integration.soc import SoCRegion
+
+from .sbt import SbtRunner
+from .cache import NetlistCache, git_revision, parse_size
+from .config import load_config, params_to_json
+from .cxu_dma import CxuStateDMA
+from .cxu_context import CxuStateContexts
+from .cxu_slice import CxuBusSlices
+from .cxu_cdc import CxuClockDomainCrossing
+from .cxu_hub import CxuHub
+from .cxu_arbiter import CxuHartArbiter
+from .cxu_stream import CxuStreams
+from .cxu import CxuConfig, cxu_bus_layout, cxu_state_layout, cxu_states
+from .cxu import cxu_ports, cpu_cxu_ports, CXU_ID_WIDTH
 
 CPU_VARIANTS = [
     "standard",
@@ -31,95 +49,368 @@ CPU_VARIANTS = [
     "debian_cxu",
 ]
 
+LINUX_VARIANTS = [
+    "linux",
+    "debian",
+    "linux_cfu",
+    "debian_cfu",
+    "linux_cxu",
+    "debian_cxu",
+]
+
+# Micro-architecture knobs (--uarch name=value,...), on top of the CPU variant's defaults.
+UARCH_KNOBS = {
+    "fetch_l1_ways": "--fetch-l1-ways={}",
+    "lsu_l1_ways": "--lsu-l1-ways={}",
+    "lsu_bypass": "--with-lsu-bypass",
+    "relaxed_branch": "--relaxed-branch",
+    "bypass_from": "--allow-bypass-from={}",
+    "btb": "--with-btb",
+    "ras": "--with-ras",
+    "gshare": "--with-gshare",
+}
+
+
+def uarch_defaults(variant):
+    linux = variant in LINUX_VARIANTS
+    return dict(
+        fetch_l1_ways=4 if linux else 2,
+        lsu_l1_ways=4 if linux else 2,
+        lsu_bypass=1,
+        relaxed_branch=1,
+        bypass_from=0,
+        btb=int(linux),
+        ras=int(linux),
+        gshare=int(linux),
+    )
+
+
+def uarch_parse(spec):
+    uarch = {}
+    for option in filter(None, spec.split(",")):
+        key, sep, value = option.partition("=")
+        key = key.strip().replace("-", "_")
+        if not sep or key not in UARCH_KNOBS:
+            raise ValueError(
+                f"Invalid micro-architecture option {option!r}, "
+                f"supported are: {', '.join(UARCH_KNOBS)}."
+            )
+        uarch[key] = int(value, 0)
+    return uarch
+
+
+def uarch_args(uarch):
+    args = ""
+    for key, arg in UARCH_KNOBS.items():
+        if "{}" in arg:
+            args += " " + arg.format(uarch[key])
+        elif uarch[key]:
+            args += " " + arg
+    return args
+
 
 class VexiiRiscvCustom(VexiiRiscv):
     variants = CPU_VARIANTS
 
+    sbt_server = False
+    sbt = None
+    netlist_cache_dir = None
+    netlist_cache_size = "8G"
+    netlist_directory = None
+    revisions = None
+    generator_cli_options = None
+    config = None
+    cxu_hub = "none"
+    pipeline = None  # tools.pipeline.Pipeline of the build, if any.
+    trace = None  # tools.trace of the build, if any (generator phases not traced otherwise).
+
+    # Command line configuration arguments.
     @staticmethod
-    def args_read(args):
-        print(args)
+    def args_fill(parser):
+        VexiiRiscv.args_fill(parser)
+        gen_group = parser.add_argument_group(title="VexiiRiscv generator options")
+        gen_group.add_argument(
+            "--sbt-server",
+            action="store_true",
+            help="Run the VexiiRiscv generators through a long-lived sbt server.",
+        )
+        gen_group.add_argument(
+            "--sbt-server-keep",
+            action="store_true",
+            help="Leave the sbt server running at exit (reused by the next build).",
+        )
+        gen_group.add_argument(
+            "--vexii-revision",
+            default="dev",
+            help="VexiiRiscv revision (branch, tag or commit) to pin the checkout to.",
+        )
+        gen_group.add_argument(
+            "--netlist-cache-dir",
+            default=os.environ.get("VEXII_NETLIST_CACHE", None),
+            help="Netlist cache directory, may be shared between machines (default: "
+            "$VEXII_NETLIST_CACHE or hw/cpu/verilog/cache).",
+        )
+        gen_group.add_argument(
+            "--netlist-cache-size",
+            default="8G",
+            help="Netlist cache size limit, least recently used entries are evicted.",
+        )
+        gen_group.add_argument(
+            "--uarch",
+            default="",
+            help="Micro-architecture overrides (name=value,...): "
+            f"{', '.join(UARCH_KNOBS)}.",
+        )
+        parser.set_defaults(vexii_checkout_ready=False)
+
+    # Build phase (see tools/trace.py), a no-op without a tracer.
+    @staticmethod
+    def phase(name):
+        if VexiiRiscvCustom.trace is None:
+            return nullcontext({})
+        return VexiiRiscvCustom.trace.phase(name)
+
+    # Generator (sbt) runner, one per process.
+    @staticmethod
+    def sbt_runner():
+        if VexiiRiscvCustom.sbt is None:
+            ndir = os.path.join(
+                os.path.dirname(__file__), "verilog", "ext", "VexiiRiscv"
+            )
+            VexiiRiscvCustom.sbt = SbtRunner(ndir, server=VexiiRiscvCustom.sbt_server)
+        return VexiiRiscvCustom.sbt
+
+    @staticmethod
+    def sbt_shutdown(args):
+        if args.sbt_server and not args.sbt_server_keep:
+            ndir = os.path.join(
+                os.path.dirname(__file__), "verilog", "ext", "VexiiRiscv"
+            )
+            SbtRunner.shutdown(ndir)
+
+    # Netlist cache, keyed on every generator input.
+    @staticmethod
+    def netlist_cache():
+        directory = VexiiRiscvCustom.netlist_cache_dir
+        if directory is None:
+            directory = os.path.join(os.path.dirname(__file__), "verilog", "cache")
+        return NetlistCache(directory, parse_size(VexiiRiscvCustom.netlist_cache_size))
+
+    @staticmethod
+    def generator_revisions():
+        if VexiiRiscvCustom.revisions is None:
+            ndir = os.path.join(
+                os.path.dirname(__file__), "verilog", "ext", "VexiiRiscv"
+            )
+            sdir = os.path.join(ndir, "ext", "SpinalHDL")
+            return git_revision(ndir), git_revision(sdir)
+        return VexiiRiscvCustom.revisions
+
+    # Command line options of the checked out generators (scopt opt[...]("name") declarations).
+    @staticmethod
+    def generator_options():
+        if VexiiRiscvCustom.generator_cli_options is None:
+            ndir = os.path.join(
+                os.path.dirname(__file__), "verilog", "ext", "VexiiRiscv"
+            )
+            options = set()
+            for root, _, filenames in os.walk(os.path.join(ndir, "src")):
+                for filename in filenames:
+                    if filename.endswith(".scala"):
+                        with open(os.path.join(root, filename), errors="replace") as f:
+                            options.update(
+                                re.findall(r'\bopt\[[^(\n]*?\]\("([\w-]+)"\)', f.read())
+                            )
+            VexiiRiscvCustom.generator_cli_options = options
+        return VexiiRiscvCustom.generator_cli_options
+
+    # Git setup.
+    # The pin of the checkout is recorded in a stamp file: git updates (network) are only done
+    # when the pin changes, when an update is requested (--update-repo=latest/wipe+latest) or
+    # when the checkout doesn't exist yet, so cached configurations build offline. The cache key
+    # revisions are always read from the checkout (local), local modifications included.
+    @staticmethod
+    def git_setup(revision, update):
         vdir = os.path.join(os.path.dirname(__file__), "verilog")
         ndir = os.path.join(vdir, "ext", "VexiiRiscv")
+        sdir = os.path.join(ndir, "ext", "SpinalHDL")
+        stamp_file = os.path.join(vdir, "ext", "VexiiRiscv.stamp")
+
+        stamp = None
+        if os.path.exists(stamp_file):
+            with open(stamp_file) as f:
+                stamp = json.load(f)
+
+        checkout = os.path.exists(ndir)
+        if update == "no":
+            if not checkout:
+                raise OSError(
+                    f"VexiiRiscv checkout not found in {ndir} and --update-repo=no: "
+                    f"clone it (revision {revision}) or run once with network access."
+                )
+            if stamp is not None and stamp["revision"] != revision:
+                raise ValueError(
+                    f"VexiiRiscv checkout pinned to {stamp['revision']}, not {revision}, "
+                    f"and --update-repo=no: pass --vexii-revision={stamp['revision']} or "
+                    f"run once with network access."
+                )
+            up_to_date = stamp is not None
+        else:
+            up_to_date = (
+                checkout
+                and stamp is not None
+                and stamp["revision"] == revision
+                and "latest" not in update
+            )
 
-        NaxRiscv.git_setup(
-            "VexiiRiscv",
-            ndir,
-            "https://github.com/pmozil/VexiiRiscv.git",
-            "dev",
-            "",
-            # args.update_repo,
-            "False",
-        )
+        if not up_to_date:
+            if update != "no":
+                NaxRiscv.git_setup(
+                    "VexiiRiscv",
+                    ndir,
+                    "https://github.com/pmozil/VexiiRiscv.git",
+                    "dev",
+                    "" if "latest" in update else revision,
+                    "wipe+recommended" if "wipe" in update else "recommended",
+                )
+                subprocess.check_call(
+                    f"cd {ndir} && git submodule update --init --recursive", shell=True
+                )
+            git_revision.cache_clear()
+            stamp = {
+                "revision": revision,
+                "vexiiriscv": git_revision(ndir),
+                "spinalhdl": git_revision(sdir),
+            }
+            with open(stamp_file, "w") as f:
+                json.dump(stamp, f, indent=1)
+
+        git_revision.cache_clear()
+        VexiiRiscvCustom.revisions = (git_revision(ndir), git_revision(sdir))
+
+    @staticmethod
+    def generator_run(main, args, key, post=None):
+        # Return the cache entry for key, running the generator in a staging directory on
+        # misses (the generator gets the staging directory through the {dir} placeholder,
+        # post is called on the staging directory before it is stored).
+        cache = VexiiRiscvCustom.netlist_cache()
+        with VexiiRiscvCustom.phase(main.split(".")[-1]) as info:
+            entry = None if VexiiRiscv.no_netlist_cache else cache.lookup(key)
+            info["cached"] = entry is not None
+            if entry is None:
+                staging = cache.staging()
+                try:
+                    VexiiRiscvCustom.sbt_runner().run_main(
+                        main, args.replace("{dir}", staging)
+                    )
+                    if post is not None:
+                        post(staging)
+                except:
+                    shutil.rmtree(staging, ignore_errors=True)
+                    raise
+                entry = cache.store(key, staging, replace=VexiiRiscv.no_netlist_cache)
+        return entry
+
+    @staticmethod
+    def args_read(args):
+        print(args)
+
+        # The parent of a --jobs build sets the checkout up once, for all its boards.
+        if not args.vexii_checkout_ready:
+            with VexiiRiscvCustom.phase("git-setup"):
+                VexiiRiscvCustom.git_setup(args.vexii_revision, args.update_repo)
 
         if not args.cpu_variant:
             args.cpu_variant = "linux"
 
-        VexiiRiscv.vexii_args += (
-            " --with-mul --with-div --allow-bypass-from=0 --performance-counters=0"
-        )
-        VexiiRiscv.vexii_args += " --fetch-l1 --fetch-l1-ways=2"
-        VexiiRiscv.vexii_args += " --lsu-l1 --lsu-l1-ways=2  --with-lsu-bypass"
-        VexiiRiscv.vexii_args += " --relaxed-branch"
-
-        if args.cpu_variant in [
-            "linux",
-            "debian",
-            "linux_cfu",
-            "debian_cfu",
-            "linux_cxu",
-            "debian_cxu",
-        ]:
+        # Start from a clean class-level configuration: args_read is called once per board and
+        # must not accumulate the previous board's arguments.
+        VexiiRiscv.vexii_args = ""
+        VexiiRiscv.with_opensbi = False
+        VexiiRiscv.gcc_triple = CPU_GCC_TRIPLE_RISCV32
+
+        VexiiRiscv.vexii_args += " --with-mul --with-div --performance-counters=0"
+        VexiiRiscv.vexii_args += " --fetch-l1 --lsu-l1"
+
+        if args.cpu_variant in LINUX_VARIANTS:
             VexiiRiscv.with_opensbi = True
             VexiiRiscv.vexii_args += " --with-rva --with-supervisor"
-            VexiiRiscv.vexii_args += (
-                " --fetch-l1-ways=4 --fetch-l1-mem-data-width-min=64"
-            )
-            VexiiRiscv.vexii_args += " --lsu-l1-ways=4 --lsu-l1-mem-data-width-min=64"
+            VexiiRiscv.vexii_args += " --fetch-l1-mem-data-width-min=64"
+            VexiiRiscv.vexii_args += " --lsu-l1-mem-data-width-min=64"
 
         if args.cpu_variant in ["debian", "debin_cfu"]:
             VexiiRiscv.vexii_args += " --xlen=64 --with-rvc --with-rvf --with-rvd --fma-reduced-accuracy --fpu-ignore-subnormal"
 
-        if args.cpu_variant in [
-            "linux",
-            "debian",
-            "linux_cfu",
-            "debian_cfu",
-            "linux_cxu",
-            "debian_cxu",
-        ]:
-            VexiiRiscv.vexii_args += " --with-btb --with-ras --with-gshare"
+        # Caches, bypasses and branch prediction: variant defaults, overridden by --uarch.
+        uarch = uarch_defaults(args.cpu_variant)
+        uarch.update(uarch_parse(args.uarch))
+        VexiiRiscv.vexii_args += uarch_args(uarch)
 
         if args.cfu:
             VexiiRiscv.vexii_args += " --with-cfu"
             args.cpu_variant += "_cfu"
             args.cpu_cfu = args.cfu
 
-        VexiiRiscv.vexii_args += f" --cxu-num {len(args.cxu)}"
+        VexiiRiscvCustom.cxu_hub = args.cxu_hub if len(args.cxu) > 0 else "none"
+        if VexiiRiscvCustom.cxu_hub != "none":
+            # A single cxuBus, all CXU selectors routed to it (see cpu/cxu_hub.py).
+            configs = [CxuConfig.parse(cxu) for cxu in args.cxu]
+            VexiiRiscv.vexii_args += f" --cxu-num 1 --cxu-hub {len(args.cxu)}"
+            VexiiRiscv.vexii_args += configs[0].generator_args(0)
+        else:
+            VexiiRiscv.vexii_args += f" --cxu-num {len(args.cxu)}"
+            for i, cxu in enumerate(args.cxu):
+                VexiiRiscv.vexii_args += CxuConfig.parse(cxu).generator_args(i)
+
+        # CXU generator options beyond --cxu-num (state geometry, contexts, outstanding requests,
+        # hub) are VexiiRiscv fork extensions: fail here rather than in sbt without them.
+        cxu_options = set(re.findall(r"--(cxu-[\w-]+)", VexiiRiscv.vexii_args))
+        missing = sorted(
+            cxu_options - {"cxu-num"} - VexiiRiscvCustom.generator_options()
+        )
+        if missing:
+            raise ValueError(
+                f"The VexiiRiscv generator (--vexii-revision={args.vexii_revision}) has no "
+                f"{', '.join('--' + option for option in missing)} option: non-default CXU "
+                f"state geometry, state contexts, outstanding requests and --cxu-hub need a "
+                f"revision implementing them."
+            )
 
         if len(args.cxu) > 0:
             args.cpu_variant += "_cxu"
 
         VexiiRiscv.jtag_tap = args.with_jtag_tap
         VexiiRiscv.jtag_instruction = args.with_jtag_instruction
-        VexiiRiscv.with_dma = args.with_coherent_dma
+        # CXU memory masters sit on the coherent DMA bus.
+        mem_masters = any(CxuConfig.parse(cxu).mem_master for cxu in args.cxu)
+        VexiiRiscv.with_dma = args.with_coherent_dma or mem_masters
         VexiiRiscv.with_axi3 = args.with_axi3
         VexiiRiscv.update_repo = args.update_repo
         VexiiRiscv.no_netlist_cache = args.no_netlist_cache
         VexiiRiscv.vexii_args += " " + args.vexii_args
+        VexiiRiscvCustom.sbt_server = args.sbt_server
+        VexiiRiscvCustom.netlist_cache_dir = args.netlist_cache_dir
+        VexiiRiscvCustom.netlist_cache_size = args.netlist_cache_size
+
+        key = NetlistCache.key(
+            "PythonArgsGen",
+            VexiiRiscv.vexii_args,
+            *VexiiRiscvCustom.generator_revisions(),
+        )
+        entry = VexiiRiscvCustom.generator_run(
+            "vexiiriscv.soc.litex.PythonArgsGen",
+            f"{VexiiRiscv.vexii_args} --python-file={{dir}}/params.py",
+            key,
+            post=params_to_json,
+        )
+        VexiiRiscvCustom.config = load_config(key, entry)
+        VexiiRiscvCustom.config.apply(VexiiRiscv)
 
-        md5_hash = hashlib.md5()
-        md5_hash.update(VexiiRiscv.vexii_args.encode("utf-8"))
-        vexii_args_hash = md5_hash.hexdigest()
-        ppath = os.path.join(vdir, str(vexii_args_hash) + ".py")
-        if VexiiRiscv.no_netlist_cache or not os.path.exists(ppath):
-            cmd = f"""cd {ndir} && sbt "runMain vexiiriscv.soc.litex.PythonArgsGen {VexiiRiscv.vexii_args} --python-file={str(ppath)}\""""
-            subprocess.check_call(cmd, shell=True)
-        with open(ppath) as file:
-            exec(file.read())
-
-        if VexiiRiscv.xlen == 64:
+        if VexiiRiscvCustom.config.xlen == 64:
             VexiiRiscv.gcc_triple = CPU_GCC_TRIPLE_RISCV64
-        VexiiRiscv.linker_output_format = f"elf{VexiiRiscv.xlen}-littleriscv"
+        VexiiRiscv.linker_output_format = (
+            f"elf{VexiiRiscvCustom.config.xlen}-littleriscv"
+        )
         if args.cpu_count:
             VexiiRiscv.cpu_count = args.cpu_count
         if args.l2_bytes:
@@ -135,13 +426,8 @@ class VexiiRiscvCustom(VexiiRiscv):
     # Netlist Generation.
     @staticmethod
     def generate_netlist():
-        vdir = os.path.join(os.path.dirname(__file__), "verilog")
-        ndir = os.path.join(vdir, "ext", "VexiiRiscv")
-        sdir = os.path.join(vdir, "ext", "SpinalHDL")
-
         gen_args = []
         gen_args.append(f"--netlist-name={VexiiRiscv.netlist_name}")
-        gen_args.append(f"--netlist-directory={vdir}")
         gen_args.append(VexiiRiscv.vexii_args)
         gen_args.append(f"--cpu-count={VexiiRiscv.cpu_count}")
         gen_args.append(f"--l2-bytes={VexiiRiscv.l2_bytes}")
@@ -157,32 +443,31 @@ class VexiiRiscvCustom(VexiiRiscv):
                 f"--memory-region={region[0]},{region[1]},{region[2]},{region[3]}"
             )
         if VexiiRiscv.jtag_tap:
-            gen_args.append(f"--with-jtag-tap")
+            gen_args.append("--with-jtag-tap")
         if VexiiRiscv.jtag_instruction:
-            gen_args.append(f"--with-jtag-instruction")
+            gen_args.append("--with-jtag-instruction")
         if VexiiRiscv.with_dma:
-            gen_args.append(f"--with-dma")
+            gen_args.append("--with-dma")
         if VexiiRiscv.with_axi3:
-            gen_args.append(f"--with-axi3")
+            gen_args.append("--with-axi3")
         for arg in VexiiRiscv.vexii_video:
             gen_args.append(f"--video {arg}")
         for arg in VexiiRiscv.vexii_macsg:
             gen_args.append(f"--mac-sg {arg}")
 
-        cmd = f"""cd {ndir} && sbt "runMain vexiiriscv.soc.litex.SocGen {" ".join(gen_args)}\""""
-        print("VexiiRiscv generation command :")
-        print(cmd)
-        subprocess.check_call(cmd, shell=True)
+        key = NetlistCache.key(
+            "SocGen", *gen_args, *VexiiRiscvCustom.generator_revisions()
+        )
+        VexiiRiscvCustom.netlist_directory = VexiiRiscvCustom.generator_run(
+            "vexiiriscv.soc.litex.SocGen",
+            " ".join(["--netlist-directory={dir}"] + gen_args),
+            key,
+        )
 
     def add_sources(self, platform):
         vdir = os.path.join(os.path.dirname(__file__), "verilog")
         print(f"VexiiRiscv netlist : {self.netlist_name}")
 
-        if VexiiRiscv.no_netlist_cache or not os.path.exists(
-            os.path.join(vdir, self.netlist_name + ".v")
-        ):
-            self.generate_netlist()
-
         # Add RAM.
         # By default, use Generic RAM implementation.
         ram_filename = "Ram_1w_1rs_Generic.v"
@@ -197,11 +482,50 @@ class VexiiRiscvCustom(VexiiRiscv):
 
         if isinstance(platform, EfinixPlatform):
             ram_filename = "Ram_1w_1rs_Efinix.v"
-        platform.add_source(os.path.join(vdir, ram_filename), "verilog")
-        platform.add_source(os.path.join(vdir, lutram_filename), "verilog")
+        # Cluster sources (also synthesized out of context by tools/ooc.py).
+        self.cluster_sources = [
+            os.path.abspath(os.path.join(vdir, ram_filename)),
+            os.path.abspath(os.path.join(vdir, lutram_filename)),
+        ]
+        for source in self.cluster_sources:
+            platform.add_source(source, "verilog")
 
-        # Add Cluster.
-        platform.add_source(os.path.join(vdir, self.netlist_name + ".v"), "verilog")
+        # Add Cluster (only needed by the toolchain: with a build pipeline, generated while the
+        # software builds, the gateware step waits for the "netlist" step).
+        def add_cluster():
+            self.generate_netlist()
+            cluster = os.path.join(
+                VexiiRiscvCustom.netlist_directory, self.netlist_name + ".v"
+            )
+            self.cluster_sources.append(os.path.abspath(cluster))
+            self.check_cxu_selectors(cluster)
+            platform.add_source(cluster, "verilog")
+
+        if VexiiRiscvCustom.pipeline is not None:
+            VexiiRiscvCustom.pipeline.submit("netlist", add_cluster)
+        else:
+            add_cluster()
+
+    # The CPU's cxu_id ports must carry the context bits of the CXU selector (the generator widens
+    # them with --cxu-contexts), else every command would go to context 0.
+    def check_cxu_selectors(self, cluster):
+        widths = getattr(self, "cxu_selector_widths", {})
+        if not widths:
+            return
+        with open(cluster) as f:
+            netlist = f.read()
+        ports = re.findall(
+            r"\boutput\s+(?:wire\s+|reg\s+)?\[(\d+):0\]\s*"
+            r"(vexiis_\d+_cxuBus_buses_(\d+)_node_cmd_payload_cxu_id)\b",
+            netlist,
+        )
+        for msb, port, bus in ports:
+            width = widths.get(int(bus), 0)
+            if int(msb) + 1 < width:
+                raise ValueError(
+                    f"CPU port {port} is {int(msb) + 1}-bit, CXU contexts need {width} bits: "
+                    f"the VexiiRiscv generator doesn't support --cxu-contexts."
+                )
 
     def add_cfu(self, cfu_filename):
         # Check CFU presence.
@@ -273,117 +597,212 @@ class VexiiRiscvCustom(VexiiRiscv):
     def add_cxus(self, cxus: list[str]):
         if not hasattr(self, "cxu_params"):
             self.cxu_params = []
-
-        for i, cxu_filename in enumerate(cxus):
-            if not os.path.exists(cxu_filename):
-                raise OSError(f"Unable to find VexRiscv CXU plugin {cxu_filename}.")
-            CXU_INPUT_DATA_W = 32
-            CXU_STATE_W = 64
-            CXU_STATE_ADDR_W = (CXU_STATE_W - 1).bit_length()
-
-            cxu_bus_layout = [
-                (
-                    "cmd",
-                    [
-                        ("valid", 1),
-                        ("ready", 1),
-                        (
-                            "payload",
-                            [
-                                ("function_id", 3),
-                                ("inputs_0", 32),
-                                ("inputs_1", 32),
-                                ("state_id", CXU_STATE_ADDR_W),
-                                ("cxu_id", 4),
-                                ("ready", 1),
-                            ],
-                        ),
-                    ],
-                ),
-                (
-                    "rsp",
-                    [
-                        ("valid", 1),
-                        ("ready", 1),
-                        (
-                            "payload",
-                            [
-                                ("outputs_0", 32),
-                                ("ready", 1),
-                            ],
-                        ),
-                    ],
-                ),
-                (
-                    "state",
-                    [
-                        # READ PORT
-                        ("read_addr", CXU_STATE_ADDR_W),
-                        ("read_data", CXU_INPUT_DATA_W),
-                        # WRITE PORT
-                        ("write_addr", CXU_STATE_ADDR_W),
-                        ("write_data", CXU_INPUT_DATA_W),
-                        ("write_en", 1),
-                    ],
-                ),
+            self.cxu_state_dmas = []
+            self.cxu_mem_masters = []
+            self.cxu_clock_domains = []
+            self.cxu_selector_widths = {}
+        harts = VexiiRiscv.cpu_count
+        hub_ports = []
+
+        for i, cxu in enumerate(cxus):
+            config = CxuConfig.parse(cxu)
+            if not os.path.exists(config.filename):
+                raise OSError(f"Unable to find VexRiscv CXU plugin {config.filename}.")
+            if harts > 1 and (config.state_dma or self.cxu_hub != "none"):
+                raise ValueError(
+                    f"CXU {config.filename}: state DMA and --cxu-hub are not supported "
+                    f"with --cpu-count > 1."
+                )
+
+            self.platform.add_source(config.filename)
+            if config.state_contexts > 1:
+                # Context bits above the CXU index, on the CPU's cxu_id ports (see add_sources).
+                bus = 0 if self.cxu_hub != "none" else i
+                width = CXU_ID_WIDTH + config.context_width
+                self.cxu_selector_widths[bus] = max(
+                    width, self.cxu_selector_widths.get(bus, 0)
+                )
+
+            # Single hart: CXU on hart 0's cxuBus (or the hub).
+            if harts == 1:
+                cpu_bus, states, selector = self.add_cxu(i, f"{i}", config)
+                if self.cxu_hub != "none":
+                    hub_ports.append((config, cpu_bus, states, selector))
+                else:
+                    prefix = f"vexiis_0_cxuBus_buses_{i}"
+                    self.cpu_params.update(
+                        cpu_cxu_ports(cpu_bus, config, prefix, states, selector)
+                    )
+
+            # Multiple harts, replicated: one CXU per hart, on its cxuBus.
+            elif config.harts == "replicate":
+                for h in range(harts):
+                    cpu_bus, states, selector = self.add_cxu(i, f"{i}_{h}", config)
+                    prefix = f"vexiis_{h}_cxuBus_buses_{i}"
+                    self.cpu_params.update(
+                        cpu_cxu_ports(cpu_bus, config, prefix, states, selector)
+                    )
+
+            # Multiple harts, shared: one CXU, arbitrated between the harts' cxuBuses.
+            else:
+                cpu_bus, states, selector = self.add_cxu(i, f"{i}", config)
+                hart_ports = []
+                for h in range(harts):
+                    hart_bus = Record(cxu_bus_layout(config))
+                    hart_states = [
+                        Record(cxu_state_layout(config, cpu=True))
+                        for _ in range(config.state_ports)
+                    ]
+                    hart_selector = Signal(32)
+                    hart_ports.append((hart_bus, hart_states, hart_selector))
+                    self.cpu_params.update(
+                        cpu_cxu_ports(
+                            hart_bus,
+                            config,
+                            f"vexiis_{h}_cxuBus_buses_{i}",
+                            hart_states,
+                            hart_selector,
+                        )
+                    )
+                arbiter = CxuHartArbiter(cpu_bus, states, selector, hart_ports)
+                setattr(self, f"cxu_arbiter_{i}", arbiter)
+
+        # CXU hub: a single cxuBus for all the CXUs.
+        if hub_ports:
+            config = hub_ports[0][0]
+            for other, *_ in hub_ports[1:]:
+                if cxu_bus_layout(other) != cxu_bus_layout(config):
+                    raise ValueError(
+                        f"CXU {other.filename} and {config.filename} have different "
+                        f"bus/state geometries, not supported with --cxu-hub."
+                    )
+            hub_bus = Record(cxu_bus_layout(config))
+            hub_states = [
+                Record(cxu_state_layout(config, cpu=True))
+                for _ in range(config.state_ports)
             ]
+            hub_selector = Signal(32)
+            self.cxu_hub_0 = CxuHub(
+                hub_bus,
+                hub_states,
+                hub_selector,
+                [ports[1:] for ports in hub_ports],
+                mode=self.cxu_hub,
+                outstanding=config.outstanding,
+            )
+            self.cpu_params.update(
+                cpu_cxu_ports(
+                    hub_bus,
+                    config,
+                    "vexiis_0_cxuBus_buses_0",
+                    hub_states,
+                    hub_selector,
+                )
+            )
 
-            cxu_bus = Record(cxu_bus_layout)
-            setattr(self, f"cxu_bus_{i}", cxu_bus)
-
-            self.cxu_params.append(
+    # Instance of CXU i (name: i, or i_<hart> for replicas) and its adapters, returns its bus,
+    # state ports and selector as seen by the CPU.
+    def add_cxu(self, i, name, config):
+        cxu_bus = Record(cxu_bus_layout(config))
+        setattr(self, f"cxu_bus_{name}", cxu_bus)
+
+        # sys or the CXU's own clock domain (created in add_soc_components).
+        cd = f"cxu{i}" if config.clk_freq else "sys"
+        reset = ResetSignal(cd) if config.clk_freq else ResetSignal("sys") | self.reset
+
+        # cmd/rsp as seen by the CPU.
+        cpu_bus = cxu_bus
+        if config.clk_freq:
+            # CPU's state port unused, the CXU's state is in the CDC's memory.
+            cpu_bus = Record(cxu_bus_layout(config))
+            cdc = CxuClockDomainCrossing(cpu_bus, cxu_bus, config, cd)
+            setattr(self, f"cxu_cdc_{name}", cdc)
+            self.cxu_clock_domains.append((name, cd, config, cdc))
+        elif (config.cmd_slice, config.rsp_slice) != ("none", "none"):
+            cpu_bus = Record(cxu_bus_layout(config))
+            slices = CxuBusSlices(cpu_bus, cxu_bus, config)
+            setattr(self, f"cxu_slices_{name}", slices)
+        # Streams (PUSH/POP function ids handled in front of the CXU).
+        streams = None
+        if config.stream_depth:
+            stream_bus = Record(cxu_bus_layout(config))
+            streams = CxuStreams(stream_bus, cpu_bus, config.stream_depth)
+            setattr(self, f"cxu_streams_{name}", streams)
+            cpu_bus = stream_bus
+
+        mem = None
+        if config.mem_master:
+            # Added to the coherent DMA bus in add_soc_components.
+            mem = wishbone.Interface(data_width=32, address_width=32, addressing="word")
+            self.cxu_mem_masters.append((name, mem))
+        self.cxu_params.append(
+            (
+                f"Cxu{i}",
                 {
-                    # CMD
-                    f"i_cmd_valid": cxu_bus.cmd.valid,
-                    f"o_cmd_ready": cxu_bus.cmd.ready,
-                    f"i_cmd_payload_function_id": cxu_bus.cmd.payload.function_id,
-                    f"i_cmd_payload_inputs_0": cxu_bus.cmd.payload.inputs_0,
-                    f"i_cmd_payload_inputs_1": cxu_bus.cmd.payload.inputs_1,
-                    f"i_cmd_payload_state_id": cxu_bus.cmd.payload.state_id,
-                    f"i_cmd_payload_cxu_id": cxu_bus.cmd.payload.cxu_id,
-                    f"i_cmd_payload_ready": cxu_bus.cmd.payload.ready,
-                    # RSP
-                    f"o_rsp_valid": cxu_bus.rsp.valid,
-                    f"i_rsp_ready": cxu_bus.rsp.ready,
-                    f"o_rsp_payload_outputs_0": cxu_bus.rsp.payload.outputs_0,
-                    f"o_rsp_payload_ready": cxu_bus.rsp.payload.ready,
-                    # STATE (BRAM-style)
-                    f"o_state_read_addr": cxu_bus.state.read_addr,
-                    f"i_state_read_data": cxu_bus.state.read_data,
-                    f"o_state_write_addr": cxu_bus.state.write_addr,
-                    f"o_state_write_data": cxu_bus.state.write_data,
-                    f"o_state_write_en": cxu_bus.state.write_en,
+                    **cxu_ports(cxu_bus, config, mem, streams),
                     # Clock / Reset
-                    f"i_clk": ClockSignal("sys"),
-                    f"i_reset": ResetSignal("sys") | self.reset,
-                }
+                    "i_clk": ClockSignal(cd),
+                    "i_reset": reset,
+                },
             )
+        )
 
-            self.platform.add_source(cxu_filename)
+        # State ports / selector as seen by the CPU.
+        states = cxu_states(cpu_bus if config.clk_freq else cxu_bus, config)
+        selector = cpu_bus.cmd.payload.cxu_id
+        shared = VexiiRiscv.cpu_count > 1 and config.harts == "shared"
+        if config.state_contexts > 1 or self.cxu_hub != "none" or shared:
+            selector = Signal(32)
+            self.comb += cpu_bus.cmd.payload.cxu_id.eq(selector)
+        if config.state_contexts > 1:
+            contexts = CxuStateContexts(cpu_bus.cmd, selector, states, config)
+            setattr(self, f"cxu_contexts_{name}", contexts)
+            states = contexts.cpu_states
+        if config.state_dma:
+            # CPU side of the state port, shared with the state DMA engine.
+            cpu_state = Record(cxu_state_layout(config, cpu=True))
+            self.cxu_state_dmas.append((name, states[0], cpu_state))
+            states = [cpu_state, *states[1:]]
+
+        return cpu_bus, states, selector
+
+    def add_soc_components(self, soc):
+        VexiiRiscv.add_soc_components(self, soc)
+
+        # CXU state DMA engines (coherent DMA bus when available).
+        for name, cxu_state, cpu_state in getattr(self, "cxu_state_dmas", []):
+            bus_handler = getattr(soc, "dma_bus", soc.bus)
+            bus = wishbone.Interface(
+                data_width=bus_handler.data_width,
+                address_width=bus_handler.address_width,
+                addressing="word",
+            )
+            bus_handler.add_master(name=f"cxu{name}_state_dma", master=bus)
+            soc.add_module(
+                name=f"cxu{name}_state_dma",
+                module=CxuStateDMA(cxu_state, cpu_state, bus),
+            )
 
-            self.cpu_params.update(
-                {
-                    # CMD
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_cmd_valid": cxu_bus.cmd.valid,
-                    f"i_vexiis_0_cxuBus_buses_{i}_node_cmd_ready": cxu_bus.cmd.ready,
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_cmd_payload_function_id": cxu_bus.cmd.payload.function_id,
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_cmd_payload_inputs_0": cxu_bus.cmd.payload.inputs_0,
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_cmd_payload_inputs_1": cxu_bus.cmd.payload.inputs_1,
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_cmd_payload_state_id": cxu_bus.cmd.payload.state_id,
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_cmd_payload_cxu_id": cxu_bus.cmd.payload.cxu_id,
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_cmd_payload_ready": cxu_bus.cmd.payload.ready,
-                    # RSP
-                    f"i_vexiis_0_cxuBus_buses_{i}_node_rsp_valid": cxu_bus.rsp.valid,
-                    f"o_vexiis_0_cxuBus_buses_{i}_node_rsp_ready": cxu_bus.rsp.ready,
-                    f"i_vexiis_0_cxuBus_buses_{i}_node_rsp_payload_outputs_0": cxu_bus.rsp.payload.outputs_0,
-                    f"i_vexiis_0_cxuBus_buses_{i}_node_rsp_payload_ready": cxu_bus.rsp.payload.ready,
-                    # STATE (BRAM interface)
-                    f"i_vexiis_0_cxuBus_buses_{i}_cxu_state_read_addr": cxu_bus.state.read_addr,
-                    f"o_vexiis_0_cxuBus_buses_{i}_cxu_state_read_data": cxu_bus.state.read_data,
-                    f"i_vexiis_0_cxuBus_buses_{i}_cxu_state_write_addr": cxu_bus.state.write_addr,
-                    f"i_vexiis_0_cxuBus_buses_{i}_cxu_state_write_data": cxu_bus.state.write_data,
-                    f"i_vexiis_0_cxuBus_buses_{i}_cxu_state_write_en": cxu_bus.state.write_en,
-                }
+        # CXU memory masters (coherent DMA bus).
+        for name, mem in getattr(self, "cxu_mem_masters", []):
+            if not hasattr(soc, "dma_bus"):
+                raise ValueError(f"CXU {name} mem_master requires a coherent DMA bus.")
+            soc.dma_bus.add_master(name=f"cxu{name}_mem", master=mem)
+
+        # CXU clock domains (from the board's PLL) and state memories.
+        for name, cd, config, cdc in getattr(self, "cxu_clock_domains", []):
+            pll = getattr(getattr(soc, "crg", None), "pll", None)
+            if pll is None:
+                raise ValueError(
+                    f"CXU {name} clk_freq requires a board CRG with a PLL."
+                )
+            if not hasattr(soc.crg, f"cd_{cd}"):  # Shared by the replicas of a CXU.
+                setattr(soc.crg, f"cd_{cd}", ClockDomain(cd))
+                pll.create_clkout(getattr(soc.crg, f"cd_{cd}"), config.clk_freq)
+            soc.bus.add_slave(
+                name=f"cxu{name}_state",
+                slave=cdc.bus,
+                region=SoCRegion(size=4 * 2**config.state_addr_width, cached=False),
             )
 
     def do_finalize(self):
@@ -424,8 +843,6 @@ class VexiiRiscvCustom(VexiiRiscv):
         self.add_sources(self.platform)
         if hasattr(self, "cfu_params"):
             self.specials += Instance("Cfu", **self.cfu_params)
-        # TODO: Add cxu instances
         if hasattr(self, "cxu_params"):
-            for i, param in enumerate(self.cxu_params):
-                print(param)
-                self.specials += Instance(f"Cxu{i}", **param)
+            for module, param in self.cxu_params:
+                self.specials += Instance(module, **param)
@@ -0,0 +1,392 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import json
+from dataclasses import dataclass, fields
+
+# CxuConfig ----------------------------------------------------------------------------------------
+
+# Per-CXU configuration, from a --cxu argument: `path[,key=value,...]`.
+#
+# Defaults can also be given in a sidecar metadata file next to the CXU (`<path>.json`, same keys),
+# CLI key/values take precedence. The state geometry (depth x width words, number of read/write
+# port pairs) is that of the state memory the CPU provides to the CXU. With state_contexts > 1,
+# the CPU provides that many independent banks of it, selected by the CXU selector (see
+# cpu/cxu_context.py). With outstanding > 1, cmd and rsp carry a request tag (as many tags as
+# outstanding requests): the CXU may accept new commands before responding and respond out of
+# order, returning each command's tag with its response. cmd_slice/rsp_slice insert register
+# slices between the CPU and the CXU (cpu/cxu_slice.py).
+#
+# CXUs declaring whole-state vector ports (state_read/state_write/state_write_en, e.g.
+# sw/linux/verilog/tflite_acc) get a single word of state as wide as the vector (state_depth 1).
+
+# cmd/rsp register slices (see cpu/cxu_slice.py): (pipe valid, pipe ready).
+CXU_SLICES = {
+    "none": (False, False),
+    "valid": (True, False),
+    "ready": (False, True),
+    "full": (True, True),
+}
+
+# Width of the CXU index in the CXU selector (cmd cxu_id), context bits are above it.
+CXU_ID_WIDTH = 4
+
+
+@dataclass(frozen=True)
+class CxuConfig:
+    filename: str
+    state_depth: int = 64
+    state_width: int = 32
+    state_ports: int = 1
+    state_contexts: int = 1
+    outstanding: int = 1
+    cmd_slice: str = "none"
+    rsp_slice: str = "none"
+    # Multi-core CPUs: a CXU per hart (replicate) or one arbitrated between them (shared).
+    harts: str = "replicate"
+    # CXU clock (Hz, from the board's PLL), 0: sys clock (see cpu/cxu_cdc.py).
+    clk_freq: float = 0
+    # Bulk state save/restore engine (cpu/cxu_dma.py) on the first state port.
+    state_dma: bool = False
+    # Wishbone master (mem_* ports) on the coherent DMA bus, for CXUs streaming memory buffers.
+    mem_master: bool = False
+    # Depth of the sink/source stream FIFOs (cpu/cxu_stream.py), 0: no streams.
+    stream_depth: int = 0
+    # Whole-state vector ports (detected from the CXU's Verilog, not an option).
+    state_vector: bool = False
+
+    @classmethod
+    def parse(cls, spec):
+        if isinstance(spec, cls):
+            return spec
+        filename, *options = spec.split(",")
+        params = {}
+        sidecar = filename + ".json"
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                params.update(json.load(f))
+        for option in options:
+            key, sep, value = option.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid CXU option {option!r} in {spec!r}.")
+            params[key.strip().replace("-", "_")] = value.strip()
+        types = {
+            f.name: f.type
+            for f in fields(cls)
+            if f.name not in ["filename", "state_vector"]
+        }
+        kwargs = {}
+        for key, value in params.items():
+            if key not in types:
+                raise ValueError(f"Unknown CXU option {key!r} for {filename}.")
+            if isinstance(value, str) and types[key] is float:
+                value = float(value)
+            elif isinstance(value, str) and types[key] is not str:
+                value = int(value, 0)
+            kwargs[key] = types[key](value)
+        vector_width = _state_vector_width(filename)
+        if vector_width is not None:
+            kwargs.setdefault("state_depth", 1)
+            kwargs.setdefault("state_width", vector_width)
+            if (kwargs["state_depth"], kwargs["state_width"]) != (1, vector_width):
+                raise ValueError(
+                    f"CXU {filename} has {vector_width}-bit state_read/state_write ports: "
+                    f"its state must be state_depth=1,state_width={vector_width}."
+                )
+            unsupported = [
+                kwargs.get("state_ports", 1) > 1,
+                kwargs.get("state_contexts", 1) > 1,
+                kwargs.get("state_dma", False),
+            ]
+            if any(unsupported):
+                raise ValueError(
+                    f"CXU {filename} with state_read/state_write ports only supports a "
+                    f"single state port, without contexts or state DMA."
+                )
+        config = cls(filename=filename, state_vector=vector_width is not None, **kwargs)
+        if config.state_depth < 1 or config.state_width < 1 or config.state_ports < 1:
+            raise ValueError(f"Invalid CXU state geometry for {filename}.")
+        contexts = config.state_contexts
+        if contexts < 1 or contexts & (contexts - 1):
+            raise ValueError(f"CXU state contexts of {filename} must be a power of 2.")
+        if config.outstanding < 1:
+            raise ValueError(f"Invalid CXU outstanding requests for {filename}.")
+        for kind in [config.cmd_slice, config.rsp_slice]:
+            if kind not in CXU_SLICES:
+                raise ValueError(
+                    f"Invalid CXU slice {kind!r} for {filename}, "
+                    f"supported are: {', '.join(CXU_SLICES)}."
+                )
+        if config.stream_depth < 0:
+            raise ValueError(f"Invalid CXU stream depth for {filename}.")
+        if config.stream_depth and config.outstanding > 1:
+            raise ValueError(
+                f"CXU {filename} streams only support 1 outstanding request."
+            )
+        if config.harts not in ["replicate", "shared"]:
+            raise ValueError(f"Invalid CXU harts {config.harts!r} for {filename}.")
+        if config.harts == "shared" and config.outstanding > 1:
+            raise ValueError(
+                f"Shared CXU {filename} only supports 1 outstanding request."
+            )
+        if config.clk_freq:
+            unsupported = [
+                config.state_ports > 1,
+                config.state_contexts > 1,
+                config.state_dma,
+                config.mem_master,
+                config.stream_depth,
+                config.state_width > 32,
+                (config.cmd_slice, config.rsp_slice) != ("none", "none"),
+            ]
+            if any(unsupported):
+                raise ValueError(
+                    f"CXU {filename} with its own clock only supports a single state port of up "
+                    f"to 32-bit words, without contexts, state DMA, memory master, streams or slices."
+                )
+        return config
+
+    @property
+    def state_addr_width(self):
+        return max(1, (self.state_depth - 1).bit_length())
+
+    # Request tag width (0: no tag, responses in command order).
+    @property
+    def tag_width(self):
+        return (self.outstanding - 1).bit_length()
+
+    @property
+    def context_width(self):
+        return (self.state_contexts - 1).bit_length()
+
+    # State address width on the CPU side (context bits above the CXU's state address).
+    @property
+    def cpu_state_addr_width(self):
+        if self.state_contexts == 1:
+            return self.state_addr_width
+        # Banks are padded to a power of 2 of words, the context being the upper address bits.
+        return (self.state_depth - 1).bit_length() + self.context_width
+
+    @property
+    def state_geometry(self):
+        return self.state_depth, self.state_width, self.state_ports
+
+    # VexiiRiscv generator arguments for the CXU at index i (only non-default settings, so the
+    # arguments, and the netlist cache keys, of existing configurations are unchanged).
+    def generator_args(self, i):
+        default = CxuConfig(self.filename)
+        args = ""
+        if self.state_geometry != default.state_geometry:
+            geometry = ",".join(str(v) for v in self.state_geometry)
+            args += f" --cxu-state={i},{geometry}"
+        if self.state_contexts != default.state_contexts:
+            args += f" --cxu-contexts={i},{self.state_contexts}"
+        if self.outstanding != default.outstanding:
+            args += f" --cxu-outstanding={i},{self.outstanding}"
+        return args
+
+
+# Width of the CXU's state_read vector port, None if it has none (BRAM-style state ports).
+def _state_vector_width(filename):
+    if not os.path.exists(filename):
+        return None
+    with open(filename) as f:
+        source = re.sub(r"//.*", "", f.read())
+    match = re.search(
+        r"\binput\s+(?:wire\s+|logic\s+)?(?:\[\s*(\d+)\s*:\s*(\d+)\s*\]\s*)?state_read\b",
+        source,
+    )
+    if match is None:
+        return None
+    return abs(int(match.group(1) or 0) - int(match.group(2) or 0)) + 1
+
+
+# CXU Bus ------------------------------------------------------------------------------------------
+
+
+def _state_name(port):
+    return "state" if port == 0 else f"state{port}"
+
+
+def cxu_state_layout(config, cpu=False):
+    addr_width = config.cpu_state_addr_width if cpu else config.state_addr_width
+    return [
+        # READ PORT
+        ("read_addr", addr_width),
+        ("read_data", config.state_width),
+        # WRITE PORT
+        ("write_addr", addr_width),
+        ("write_data", config.state_width),
+        ("write_en", 1),
+    ]
+
+
+def cxu_bus_layout(config):
+    tag = [("tag", config.tag_width)] if config.tag_width else []
+    layout = [
+        (
+            "cmd",
+            [
+                ("valid", 1),
+                ("ready", 1),
+                (
+                    "payload",
+                    [
+                        ("function_id", 3),
+                        ("inputs_0", 32),
+                        ("inputs_1", 32),
+                        ("state_id", config.state_addr_width),
+                        ("cxu_id", CXU_ID_WIDTH),
+                        ("ready", 1),
+                        *tag,
+                    ],
+                ),
+            ],
+        ),
+        (
+            "rsp",
+            [
+                ("valid", 1),
+                ("ready", 1),
+                (
+                    "payload",
+                    [
+                        ("outputs_0", 32),
+                        ("ready", 1),
+                        *tag,
+                    ],
+                ),
+            ],
+        ),
+    ]
+    for port in range(config.state_ports):
+        layout.append((_state_name(port), cxu_state_layout(config)))
+    return layout
+
+
+def cxu_states(bus, config):
+    return [getattr(bus, _state_name(port)) for port in range(config.state_ports)]
+
+
+# Ports of the Cxu{i} instance (clock/reset excepted).
+def cxu_ports(bus, config, mem=None, streams=None):
+    ports = {
+        # CMD
+        "i_cmd_valid": bus.cmd.valid,
+        "o_cmd_ready": bus.cmd.ready,
+        "i_cmd_payload_function_id": bus.cmd.payload.function_id,
+        "i_cmd_payload_inputs_0": bus.cmd.payload.inputs_0,
+        "i_cmd_payload_inputs_1": bus.cmd.payload.inputs_1,
+        "i_cmd_payload_state_id": bus.cmd.payload.state_id,
+        "i_cmd_payload_cxu_id": bus.cmd.payload.cxu_id,
+        "i_cmd_payload_ready": bus.cmd.payload.ready,
+        # RSP
+        "o_rsp_valid": bus.rsp.valid,
+        "i_rsp_ready": bus.rsp.ready,
+        "o_rsp_payload_outputs_0": bus.rsp.payload.outputs_0,
+        "o_rsp_payload_ready": bus.rsp.payload.ready,
+    }
+    # TAG
+    if config.tag_width:
+        ports["i_cmd_payload_tag"] = bus.cmd.payload.tag
+        ports["o_rsp_payload_tag"] = bus.rsp.payload.tag
+    # STATE (whole-state vector: the single word, read/write addresses left at 0)
+    if config.state_vector:
+        ports.update(
+            {
+                "i_state_read": bus.state.read_data,
+                "o_state_write": bus.state.write_data,
+                "o_state_write_en": bus.state.write_en,
+            }
+        )
+    # STATE (BRAM-style)
+    for port in range(0 if config.state_vector else config.state_ports):
+        name = _state_name(port)
+        state = getattr(bus, name)
+        ports.update(
+            {
+                f"o_{name}_read_addr": state.read_addr,
+                f"i_{name}_read_data": state.read_data,
+                f"o_{name}_write_addr": state.write_addr,
+                f"o_{name}_write_data": state.write_data,
+                f"o_{name}_write_en": state.write_en,
+            }
+        )
+    # MEM (Wishbone master, 32-bit word addressed)
+    if mem is not None:
+        ports.update(
+            {
+                "o_mem_adr": mem.adr,
+                "o_mem_dat_w": mem.dat_w,
+                "i_mem_dat_r": mem.dat_r,
+                "o_mem_sel": mem.sel,
+                "o_mem_cyc": mem.cyc,
+                "o_mem_stb": mem.stb,
+                "i_mem_ack": mem.ack,
+                "o_mem_we": mem.we,
+                "o_mem_cti": mem.cti,
+                "o_mem_bte": mem.bte,
+                "i_mem_err": mem.err,
+            }
+        )
+    # STREAMS (CPU -> CXU sink, CXU -> CPU source)
+    if streams is not None:
+        ports.update(
+            {
+                "i_sink_valid": streams.sink.valid,
+                "o_sink_ready": streams.sink.ready,
+                "i_sink_payload_data": streams.sink.data,
+                "o_source_valid": streams.source.valid,
+                "i_source_ready": streams.source.ready,
+                "o_source_payload_data": streams.source.data,
+            }
+        )
+    return ports
+
+
+# Ports of the CPU netlist for the cxuBus at prefix (e.g. vexiis_0_cxuBus_buses_0), states and
+# selector replace the bus' state ports and cmd cxu_id when something sits between the CXU and the
+# CPU.
+def cpu_cxu_ports(bus, config, prefix, states=None, selector=None):
+    if states is None:
+        states = cxu_states(bus, config)
+    if selector is None:
+        selector = bus.cmd.payload.cxu_id
+    ports = {
+        # CMD
+        f"o_{prefix}_node_cmd_valid": bus.cmd.valid,
+        f"i_{prefix}_node_cmd_ready": bus.cmd.ready,
+        f"o_{prefix}_node_cmd_payload_function_id": bus.cmd.payload.function_id,
+        f"o_{prefix}_node_cmd_payload_inputs_0": bus.cmd.payload.inputs_0,
+        f"o_{prefix}_node_cmd_payload_inputs_1": bus.cmd.payload.inputs_1,
+        f"o_{prefix}_node_cmd_payload_state_id": bus.cmd.payload.state_id,
+        f"o_{prefix}_node_cmd_payload_cxu_id": selector,
+        f"o_{prefix}_node_cmd_payload_ready": bus.cmd.payload.ready,
+        # RSP
+        f"i_{prefix}_node_rsp_valid": bus.rsp.valid,
+        f"o_{prefix}_node_rsp_ready": bus.rsp.ready,
+        f"i_{prefix}_node_rsp_payload_outputs_0": bus.rsp.payload.outputs_0,
+        f"i_{prefix}_node_rsp_payload_ready": bus.rsp.payload.ready,
+    }
+    # TAG
+    if config.tag_width:
+        ports[f"o_{prefix}_node_cmd_payload_tag"] = bus.cmd.payload.tag
+        ports[f"i_{prefix}_node_rsp_payload_tag"] = bus.rsp.payload.tag
+    # STATE (BRAM interface)
+    for port, state in enumerate(states):
+        name = _state_name(port)
+        ports.update(
+            {
+                f"i_{prefix}_cxu_{name}_read_addr": state.read_addr,
+                f"o_{prefix}_cxu_{name}_read_data": state.read_data,
+                f"i_{prefix}_cxu_{name}_write_addr": state.write_addr,
+                f"i_{prefix}_cxu_{name}_write_data": state.write_data,
+                f"i_{prefix}_cxu_{name}_write_en": state.write_en,
+            }
+        )
+    return ports
@@ -0,0 +1,78 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+from migen.genlib.roundrobin import RoundRobin, SP_CE
+
+from litex.gen import LiteXModule
+
+# CXU Hart Arbiter ---------------------------------------------------------------------------------
+
+# A CXU shared between the harts of a multi-core CPU (harts=shared option).
+#
+# Commands from the harts' cxuBuses are arbitrated round-robin; a command's hart owns the CXU until
+# its response is accepted (one request in flight, the response may come with the command). The
+# response and the CXU's state port go to that hart, whose state memory holds its own copy of the
+# CXU's state.
+
+
+class CxuHartArbiter(LiteXModule):
+    def __init__(self, cxu_bus, cxu_states, cxu_selector, harts):
+        # cxu_bus/cxu_states/cxu_selector: CXU side, harts: (bus, states, selector) per hart.
+
+        # # #
+
+        busy = Signal()
+        in_flight = Signal()
+        owner = Signal(max=max(len(harts), 2))
+        active = Signal(max=max(len(harts), 2))
+        self.arbiter = arbiter = RoundRobin(len(harts), SP_CE)
+        self.comb += [
+            arbiter.request.eq(Cat(*[bus.cmd.valid for bus, _, _ in harts])),
+            # The grant only moves when no command is pending or it fires (stable stalled command).
+            arbiter.ce.eq(~busy & ~(cxu_bus.cmd.valid & ~cxu_bus.cmd.ready)),
+            active.eq(Mux(busy, owner, arbiter.grant)),
+            in_flight.eq(busy | cxu_bus.cmd.valid),
+        ]
+        cmd_fire = cxu_bus.cmd.valid & cxu_bus.cmd.ready
+        rsp_fire = cxu_bus.rsp.valid & cxu_bus.rsp.ready
+        self.sync += [
+            If(
+                cmd_fire & ~rsp_fire,
+                busy.eq(1),
+                owner.eq(arbiter.grant),
+            ).Elif(
+                rsp_fire,
+                busy.eq(0),
+            )
+        ]
+
+        cases = {}
+        for h, (bus, states, selector) in enumerate(harts):
+            cases[h] = [
+                # CMD (from the granted hart, when idle).
+                cxu_bus.cmd.valid.eq(bus.cmd.valid & ~busy),
+                bus.cmd.ready.eq(cxu_bus.cmd.ready & ~busy),
+                cxu_selector.eq(selector),
+                # RSP (to the owner).
+                bus.rsp.valid.eq(cxu_bus.rsp.valid & in_flight),
+                bus.rsp.payload.raw_bits().eq(cxu_bus.rsp.payload.raw_bits()),
+                cxu_bus.rsp.ready.eq(bus.rsp.ready & in_flight),
+            ]
+            for name, _ in bus.cmd.payload.layout:
+                if name != "cxu_id":  # From the selector.
+                    cxu_payload = getattr(cxu_bus.cmd.payload, name)
+                    cases[h].append(cxu_payload.eq(getattr(bus.cmd.payload, name)))
+            # STATE.
+            for cxu_state, state in zip(cxu_states, states):
+                cases[h] += [
+                    state.read_addr.eq(cxu_state.read_addr),
+                    cxu_state.read_data.eq(state.read_data),
+                    state.write_addr.eq(cxu_state.write_addr),
+                    state.write_data.eq(cxu_state.write_data),
+                    state.write_en.eq(cxu_state.write_en),
+                ]
+        self.comb += Case(active, cases)
@@ -0,0 +1,112 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import LiteXModule
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+# CXU Clock Domain Crossing ------------------------------------------------------------------------
+
+# Runs a CXU in its own clock domain (clk_freq option).
+#
+# cmd/rsp cross between sys and the CXU's domain through async FIFOs. The CPU's state memory is
+# in sys so the CXU's state moves to a memory in the CXU's domain (CXU read port + a write port
+# shared with the system side); software accesses it as a memory region (Wishbone slave in sys,
+# requests/responses crossing through async FIFOs, in order with each other). The CXU's read port
+# is asynchronous, as the CPU's state port: the CXU sees the same read latency in both domains.
+
+
+def _cross(source, sink, cd_from, cd_to, depth):
+    # source/sink: valid/ready/payload records (payload as a flat vector, CXU payloads have a
+    # "ready" field, reserved in stream layouts).
+    cdc = stream.ClockDomainCrossing(
+        [("data", len(source.payload))], cd_from=cd_from, cd_to=cd_to, depth=depth
+    )
+    return cdc, [
+        cdc.sink.valid.eq(source.valid),
+        source.ready.eq(cdc.sink.ready),
+        cdc.sink.data.eq(source.payload.raw_bits()),
+        sink.valid.eq(cdc.source.valid),
+        cdc.source.ready.eq(sink.ready),
+        sink.payload.raw_bits().eq(cdc.source.data),
+    ]
+
+
+class CxuClockDomainCrossing(LiteXModule):
+    def __init__(self, cpu_bus, cxu_bus, config, cd, depth=8):
+        addr_width = config.state_addr_width
+        data_width = config.state_width
+        assert data_width <= 32
+        self.bus = bus = wishbone.Interface(data_width=32, address_width=32)
+
+        # # #
+
+        # CMD / RSP.
+        self.cmd_cdc, cmd = _cross(cpu_bus.cmd, cxu_bus.cmd, "sys", cd, depth)
+        self.rsp_cdc, rsp = _cross(cxu_bus.rsp, cpu_bus.rsp, cd, "sys", depth)
+        self.comb += cmd + rsp
+
+        # State memory.
+        state = cxu_bus.state
+        mem = Memory(data_width, config.state_depth)
+        read_port = mem.get_port(async_read=True, clock_domain=cd)
+        write_port = mem.get_port(write_capable=True, clock_domain=cd)
+        self.specials += mem, read_port, write_port
+        self.comb += [
+            read_port.adr.eq(state.read_addr),
+            state.read_data.eq(read_port.dat_r),
+        ]
+
+        # System side requests / responses.
+        self.req_cdc = req = stream.ClockDomainCrossing(
+            [("we", 1), ("adr", addr_width), ("data", data_width)],
+            cd_from="sys",
+            cd_to=cd,
+            depth=4,
+        )
+        self.resp_cdc = resp = stream.ClockDomainCrossing(
+            [("data", data_width)], cd_from=cd, cd_to="sys", depth=4
+        )
+        pending = Signal()
+        self.comb += [
+            req.sink.valid.eq(bus.cyc & bus.stb & ~pending),
+            req.sink.we.eq(bus.we),
+            req.sink.adr.eq(bus.adr),
+            req.sink.data.eq(bus.dat_w),
+            resp.source.ready.eq(1),
+            bus.ack.eq(resp.source.valid),
+            bus.dat_r.eq(resp.source.data),
+        ]
+        self.sync += [
+            If(req.sink.valid & req.sink.ready, pending.eq(1)),
+            If(resp.source.valid, pending.eq(0)),
+        ]
+
+        # Write port: CXU first, system side requests when the CXU isn't writing (responses
+        # one cycle later, with the synchronous read data).
+        serve = Signal()
+        served = Signal()
+        self.comb += [
+            serve.eq(req.source.valid & ~state.write_en),
+            req.source.ready.eq(serve),
+            If(
+                state.write_en,
+                write_port.adr.eq(state.write_addr),
+                write_port.dat_w.eq(state.write_data),
+                write_port.we.eq(1),
+            ).Else(
+                write_port.adr.eq(req.source.adr),
+                write_port.dat_w.eq(req.source.data),
+                write_port.we.eq(serve & req.source.we),
+            ),
+            resp.sink.valid.eq(served),
+            resp.sink.data.eq(write_port.dat_r),
+        ]
+        sync_cxu = getattr(self.sync, cd)
+        sync_cxu += served.eq(serve)
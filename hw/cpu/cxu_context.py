@@ -0,0 +1,53 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import LiteXModule
+
+from .cxu import CXU_ID_WIDTH, cxu_state_layout
+
+# CXU State Contexts -------------------------------------------------------------------------------
+
+# Independent state banks (hardware contexts) for a CXU sharing the CPU's state memory.
+#
+# The CPU's state memory is `contexts` banks of the CXU's state depth; the CPU forwards the CXU
+# selector CSR as the command's cxu_id, its low CXU_ID_WIDTH bits select the CXU and the bits above
+# the context. The context is latched when a command is accepted and prepended to the CXU's state
+# addresses, so the CXU still sees a single bank and switching context is a selector write. Banks
+# are padded to a power of 2 of words: word w of context c is at CPU state index
+# (c << bank bits) | w.
+#
+# cmd is the CPU side of the bus: with a cmd register slice, switch contexts while the CXU is idle.
+
+
+class CxuStateContexts(LiteXModule):
+    def __init__(self, cmd, selector, cxu_states, config):
+        context_width = config.context_width
+        bank_width = config.cpu_state_addr_width - context_width
+        self.cpu_states = [
+            Record(cxu_state_layout(config, cpu=True)) for _ in cxu_states
+        ]
+
+        # # #
+
+        # Context of the command being issued, then of the last accepted one.
+        context = Signal(context_width)
+        context_last = Signal(context_width)
+        context_cmd = selector[CXU_ID_WIDTH : CXU_ID_WIDTH + context_width]
+        self.sync += If(cmd.valid & cmd.ready, context_last.eq(context_cmd))
+        self.comb += context.eq(Mux(cmd.valid, context_cmd, context_last))
+
+        for cxu_state, cpu_state in zip(cxu_states, self.cpu_states):
+            self.comb += [
+                cpu_state.read_addr.eq(Cat(cxu_state.read_addr[:bank_width], context)),
+                cxu_state.read_data.eq(cpu_state.read_data),
+                cpu_state.write_addr.eq(
+                    Cat(cxu_state.write_addr[:bank_width], context)
+                ),
+                cpu_state.write_data.eq(cxu_state.write_data),
+                cpu_state.write_en.eq(cxu_state.write_en),
+            ]
@@ -0,0 +1,146 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import LiteXModule
+
+from litex.soc.interconnect.csr import *
+
+# CXU State DMA ------------------------------------------------------------------------------------
+
+# Copies a range of a CXU's state memory to/from a memory buffer, as a bus master.
+#
+# The engine sits between the CXU and the CPU's state port: while a transfer is running it
+# drives the port (the CXU must be idle), otherwise the CXU does. Each state word (up to the bus
+# data width) is one bus word. Software programs base/index/length/direction, writes start and
+# polls done; with a non-coherent bus, the buffer must not be cached by the CPU.
+
+SAVE = 0
+RESTORE = 1
+
+
+class CxuStateDMA(LiteXModule):
+    def __init__(self, cxu_state, cpu_state, bus):
+        addr_width = len(cpu_state.read_addr)
+        data_width = len(cpu_state.read_data)
+        assert data_width <= bus.data_width
+
+        self.base = CSRStorage(32, description="Buffer base address (bytes).")
+        self.index = CSRStorage(addr_width, description="First state word.")
+        self.length = CSRStorage(addr_width + 1, description="Number of state words.")
+        self.direction = CSRStorage(
+            1, description="0: Save (state to memory), 1: Restore (memory to state)."
+        )
+        self.start = CSR()
+        self.done = CSRStatus(reset=1)
+
+        # # #
+
+        adr = Signal(bus.address_width)
+        idx = Signal(addr_width)
+        count = Signal(addr_width + 1)
+        data = Signal(data_width)
+        active = Signal()
+        read_addr = Signal(addr_width)
+        write_en = Signal()
+
+        # State port: engine while active, CXU otherwise.
+        self.comb += [
+            cxu_state.read_data.eq(cpu_state.read_data),
+            If(
+                active,
+                cpu_state.read_addr.eq(read_addr),
+                cpu_state.write_addr.eq(idx),
+                cpu_state.write_data.eq(data),
+                cpu_state.write_en.eq(write_en),
+            ).Else(
+                cpu_state.read_addr.eq(cxu_state.read_addr),
+                cpu_state.write_addr.eq(cxu_state.write_addr),
+                cpu_state.write_data.eq(cxu_state.write_data),
+                cpu_state.write_en.eq(cxu_state.write_en),
+            ),
+        ]
+
+        # Bus word address of the buffer.
+        shift = log2_int(bus.data_width // 8)
+        self.comb += bus.sel.eq(2 ** len(bus.sel) - 1)
+
+        self.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act(
+            "IDLE",
+            If(
+                self.start.re,
+                NextValue(adr, self.base.storage[shift:]),
+                NextValue(idx, self.index.storage),
+                NextValue(count, self.length.storage),
+                NextState("NEXT"),
+            ),
+        )
+        fsm.act(
+            "NEXT",
+            active.eq(1),
+            read_addr.eq(idx),
+            If(
+                count == 0,
+                NextState("IDLE"),
+            )
+            .Elif(
+                self.direction.storage == SAVE,
+                NextState("STATE-READ"),
+            )
+            .Else(
+                NextState("BUS-READ"),
+            ),
+        )
+        # Save: state word -> bus.
+        fsm.act(
+            "STATE-READ",  # Address presented in NEXT, data valid now (sync or async read).
+            active.eq(1),
+            read_addr.eq(idx),
+            NextValue(data, cpu_state.read_data),
+            NextState("BUS-WRITE"),
+        )
+        fsm.act(
+            "BUS-WRITE",
+            active.eq(1),
+            read_addr.eq(idx),
+            bus.stb.eq(1),
+            bus.cyc.eq(1),
+            bus.we.eq(1),
+            bus.adr.eq(adr),
+            bus.dat_w.eq(data),
+            If(
+                bus.ack,
+                NextValue(adr, adr + 1),
+                NextValue(idx, idx + 1),
+                NextValue(count, count - 1),
+                NextState("NEXT"),
+            ),
+        )
+        # Restore: bus -> state word.
+        fsm.act(
+            "BUS-READ",
+            active.eq(1),
+            bus.stb.eq(1),
+            bus.cyc.eq(1),
+            bus.adr.eq(adr),
+            If(
+                bus.ack,
+                NextValue(data, bus.dat_r),
+                NextState("STATE-WRITE"),
+            ),
+        )
+        fsm.act(
+            "STATE-WRITE",
+            active.eq(1),
+            write_en.eq(1),
+            NextValue(adr, adr + 1),
+            NextValue(idx, idx + 1),
+            NextValue(count, count - 1),
+            NextState("NEXT"),
+        )
+        self.comb += self.done.status.eq(fsm.ongoing("IDLE"))
@@ -0,0 +1,129 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import LiteXModule
+
+from litex.soc.interconnect import stream
+
+from .cxu import CXU_ID_WIDTH
+
+# CXU Hub ------------------------------------------------------------------------------------------
+
+# Up to 2**CXU_ID_WIDTH CXUs behind a single CPU cxuBus (--cxu-hub).
+#
+# Commands are routed to the CXU selected by cxu_id (low bits of the CXU selector), responses are
+# arbitrated round-robin between the CXUs with requests in flight (or being issued, for
+# responses coming with their command) and the state port is muxed on the CXU selector, as the
+# CPU does between its cxuBuses. In registered mode, commands (with their selector) and responses
+# go through a register stage (+1 cycle each way), otherwise routing is combinatorial.
+
+CXU_HUB_MODES = ["none", "comb", "registered"]
+
+
+def _buffer(source, sink, extra=[]):
+    # source -> stream.Buffer -> sink, payload as a flat vector (CXU payloads have a "ready"
+    # field, reserved in stream layouts), extra: [(source signal, sink signal)] carried along.
+    layout = [("data", len(source.payload))]
+    layout += [(f"extra{i}", len(s)) for i, (s, _) in enumerate(extra)]
+    buf = stream.Buffer(layout)
+    return buf, [
+        buf.sink.valid.eq(source.valid),
+        source.ready.eq(buf.sink.ready),
+        buf.sink.data.eq(source.payload.raw_bits()),
+        *[getattr(buf.sink, f"extra{i}").eq(s) for i, (s, _) in enumerate(extra)],
+        sink.valid.eq(buf.source.valid),
+        buf.source.ready.eq(sink.ready),
+        sink.payload.raw_bits().eq(buf.source.data),
+        *[d.eq(getattr(buf.source, f"extra{i}")) for i, (_, d) in enumerate(extra)],
+    ]
+
+
+class CxuHub(LiteXModule):
+    def __init__(
+        self, cpu_bus, cpu_states, cpu_selector, ports, mode="comb", outstanding=1
+    ):
+        # ports: (bus, states, selector) of each CXU, as seen by the CPU.
+        assert mode in CXU_HUB_MODES[1:]
+        assert len(ports) <= 2**CXU_ID_WIDTH
+
+        # # #
+
+        # CMD.
+        cmd = cpu_bus.cmd
+        selector = cpu_selector
+        if mode == "registered":
+            cmd = Record(cpu_bus.cmd.layout)
+            selector = Signal(len(cpu_selector))
+            self.cmd_buffer, buffer = _buffer(
+                cpu_bus.cmd, cmd, [(cpu_selector, selector)]
+            )
+            self.comb += buffer
+        cxu_id = selector[:CXU_ID_WIDTH]
+        cmd_ready = {}
+        for i, (bus, _, port_selector) in enumerate(ports):
+            self.comb += [
+                bus.cmd.valid.eq(cmd.valid & (cxu_id == i)),
+                port_selector.eq(selector),
+            ]
+            for name, _ in cmd.payload.layout:
+                if name != "cxu_id":  # From the selector.
+                    port_payload = getattr(bus.cmd.payload, name)
+                    self.comb += port_payload.eq(getattr(cmd.payload, name))
+            cmd_ready[i] = cmd.ready.eq(bus.cmd.ready)
+        self.comb += Case(cxu_id, cmd_ready)
+
+        # RSP.
+        rsp = cpu_bus.rsp
+        if mode == "registered":
+            rsp = Record(cpu_bus.rsp.layout)
+            self.rsp_buffer, buffer = _buffer(rsp, cpu_bus.rsp)
+            self.comb += buffer
+        n = len(ports)
+        request = Signal(n)
+        masked = Signal(n)
+        grant = Signal(max=max(n, 2))
+        last = Signal(max=max(n, 2))
+        for i, (bus, _, _) in enumerate(ports):
+            # Requests in flight on this CXU.
+            pending = Signal(max=outstanding + 1)
+            cmd_fire = bus.cmd.valid & bus.cmd.ready
+            rsp_fire = bus.rsp.valid & bus.rsp.ready
+            self.sync += If(cmd_fire & ~rsp_fire, pending.eq(pending + 1)).Elif(
+                rsp_fire & ~cmd_fire, pending.eq(pending - 1)
+            )
+            self.comb += request[i].eq(bus.rsp.valid & ((pending != 0) | bus.cmd.valid))
+        # Round-robin: first request after the last granted CXU, else first request.
+        self.comb += masked.eq(request & ~((2 << last) - 1))
+        for i in reversed(range(n)):
+            self.comb += If(request[i], grant.eq(i))
+        for i in reversed(range(n)):
+            self.comb += If(masked[i], grant.eq(i))
+        self.sync += If(rsp.valid & rsp.ready, last.eq(grant))
+        rsp_cases = {}
+        for i, (bus, _, _) in enumerate(ports):
+            rsp_cases[i] = [
+                rsp.valid.eq(request[i]),
+                rsp.payload.raw_bits().eq(bus.rsp.payload.raw_bits()),
+                bus.rsp.ready.eq(rsp.ready & request[i]),
+            ]
+        self.comb += Case(grant, rsp_cases)
+
+        # STATE.
+        active = cpu_selector[:CXU_ID_WIDTH]
+        for port, cpu_state in enumerate(cpu_states):
+            state_cases = {}
+            for i, (_, states, _) in enumerate(ports):
+                state = states[port]
+                self.comb += state.read_data.eq(cpu_state.read_data)
+                state_cases[i] = [
+                    cpu_state.read_addr.eq(state.read_addr),
+                    cpu_state.write_addr.eq(state.write_addr),
+                    cpu_state.write_data.eq(state.write_data),
+                    cpu_state.write_en.eq(state.write_en),
+                ]
+            self.comb += Case(active, state_cases)
@@ -0,0 +1,51 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import LiteXModule
+
+from litex.soc.interconnect import stream
+
+from .cxu import CXU_SLICES
+
+# CXU Bus Slices -----------------------------------------------------------------------------------
+
+# Register slices between the CPU's cxuBus and a CXU, to take the CXU off the CPU's critical path.
+#
+# cmd (CPU -> CXU) and rsp (CXU -> CPU) are sliced independently (cmd_slice/rsp_slice options):
+# - valid: valid/payload registered (+1 cycle of latency, ready path still combinatorial).
+# - ready: ready registered (skid buffer, no added latency when the sink is ready).
+# - full:  both (all paths registered, +1 cycle of latency).
+# All keep full throughput (one transfer per cycle).
+
+
+def _slice(source, sink, kind):
+    # source/sink: valid/ready/payload records, source -> sink.
+    pipe_valid, pipe_ready = CXU_SLICES[kind]
+    if not (pipe_valid or pipe_ready):
+        return None, [
+            sink.valid.eq(source.valid),
+            source.ready.eq(sink.ready),
+            sink.payload.raw_bits().eq(source.payload.raw_bits()),
+        ]
+    # Payload as a flat vector (CXU payloads have a "ready" field, reserved in stream layouts).
+    buf = stream.Buffer([("data", len(source.payload))], pipe_valid, pipe_ready)
+    return buf, [
+        buf.sink.valid.eq(source.valid),
+        source.ready.eq(buf.sink.ready),
+        buf.sink.data.eq(source.payload.raw_bits()),
+        sink.valid.eq(buf.source.valid),
+        buf.source.ready.eq(sink.ready),
+        sink.payload.raw_bits().eq(buf.source.data),
+    ]
+
+
+class CxuBusSlices(LiteXModule):
+    def __init__(self, cpu_bus, cxu_bus, config):
+        self.cmd_buffer, cmd = _slice(cpu_bus.cmd, cxu_bus.cmd, config.cmd_slice)
+        self.rsp_buffer, rsp = _slice(cxu_bus.rsp, cpu_bus.rsp, config.rsp_slice)
+        self.comb += cmd + rsp
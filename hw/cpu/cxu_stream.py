@@ -0,0 +1,89 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from migen import *
+
+from litex.gen import LiteXModule
+
+from litex.soc.interconnect import stream
+
+# CXU Streams --------------------------------------------------------------------------------------
+
+# Multi-word operands/results for a CXU (stream_depth option), through FIFOs on the CXU's
+# sink/source stream ports.
+#
+# Two function ids are taken over on the CPU side: PUSH writes inputs_0 to the sink FIFO (returns
+# 0), POP returns the next word of the source FIFO; both stall while the FIFO is full/empty and
+# are answered in the cycle they are accepted. Other function ids go to the CXU as usual, one
+# request at a time (PUSH/POP wait for the CXU's response, keeping responses in order).
+
+PUSH = 7
+POP = 6
+
+
+class CxuStreams(LiteXModule):
+    def __init__(self, cpu_bus, cxu_bus, depth):
+        # sink: words pushed by the CPU, to the CXU, source: words from the CXU, popped by the CPU.
+        self.sink = stream.Endpoint([("data", 32)])
+        self.source = stream.Endpoint([("data", 32)])
+
+        # # #
+
+        # FIFOs.
+        self.sink_fifo = sink_fifo = stream.SyncFIFO([("data", 32)], depth)
+        self.source_fifo = source_fifo = stream.SyncFIFO([("data", 32)], depth)
+        self.comb += [
+            sink_fifo.source.connect(self.sink),
+            self.source.connect(source_fifo.sink),
+        ]
+
+        # Request in flight on the CXU.
+        pending = Signal()
+        cxu_cmd_fire = cxu_bus.cmd.valid & cxu_bus.cmd.ready
+        cxu_rsp_fire = cxu_bus.rsp.valid & cxu_bus.rsp.ready
+        self.sync += If(cxu_cmd_fire & ~cxu_rsp_fire, pending.eq(1)).Elif(
+            cxu_rsp_fire, pending.eq(0)
+        )
+
+        # PUSH/POP, answered here, other function ids to the CXU.
+        cmd = cpu_bus.cmd
+        rsp = cpu_bus.rsp
+        function_id = cmd.payload.function_id
+        local = Signal()
+        self.comb += [
+            local.eq((function_id == PUSH) | (function_id == POP)),
+            cxu_bus.cmd.payload.raw_bits().eq(cmd.payload.raw_bits()),
+            sink_fifo.sink.data.eq(cmd.payload.inputs_0),
+        ]
+        self.comb += (
+            If(
+                local & pending,
+                # Wait for the CXU's response.
+                rsp.valid.eq(cxu_bus.rsp.valid),
+                rsp.payload.raw_bits().eq(cxu_bus.rsp.payload.raw_bits()),
+                cxu_bus.rsp.ready.eq(rsp.ready),
+            )
+            .Elif(
+                cmd.valid & (function_id == PUSH),
+                sink_fifo.sink.valid.eq(rsp.ready),
+                cmd.ready.eq(sink_fifo.sink.ready & rsp.ready),
+                rsp.valid.eq(sink_fifo.sink.ready),
+            )
+            .Elif(
+                cmd.valid & (function_id == POP),
+                source_fifo.source.ready.eq(rsp.ready),
+                cmd.ready.eq(source_fifo.source.valid & rsp.ready),
+                rsp.valid.eq(source_fifo.source.valid),
+                rsp.payload.outputs_0.eq(source_fifo.source.data),
+            )
+            .Else(
+                cxu_bus.cmd.valid.eq(cmd.valid),
+                cmd.ready.eq(cxu_bus.cmd.ready),
+                rsp.valid.eq(cxu_bus.rsp.valid),
+                rsp.payload.raw_bits().eq(cxu_bus.rsp.payload.raw_bits()),
+                cxu_bus.rsp.ready.eq(rsp.ready),
+            )
+        )
@@ -0,0 +1,58 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import subprocess
+
+# SbtRunner ----------------------------------------------------------------------------------------
+
+# Runs `sbt "runMain ..."` commands in a Scala project.
+#
+# In server mode, commands go through sbt's thin client (`sbt --client`): the first command boots
+# a sbt server for the project, later commands (from this process or any other one, e.g. parallel
+# board builds) are sent to the same warm JVM over its local socket, skipping JVM/sbt startup and
+# the Scala compilation check. If the server can't be used, the runner falls back to one sbt
+# process per command.
+
+
+class SbtRunner:
+    def __init__(self, directory, server=False):
+        self.directory = directory
+        self.server = server
+        self.started = False
+
+    def _call(self, command, client):
+        sbt = "sbt --client" if client else "sbt"
+        cmd = f"""cd {self.directory} && {sbt} "{command}\""""
+        print("VexiiRiscv sbt command :")
+        print(cmd)
+        return subprocess.call(cmd, shell=True)
+
+    def start(self):
+        if self.started or not self.server:
+            return
+        self.started = True
+        # Boot (or connect to) the server and compile the project once.
+        if self._call("compile", client=True) != 0:
+            print(
+                "sbt server unavailable, falling back to one sbt process per command."
+            )
+            self.server = False
+
+    def run_main(self, main, args):
+        command = f"runMain {main} {args}"
+        self.start()
+        if self.server:
+            if self._call(command, client=True) == 0:
+                return
+            print("sbt server command failed, retrying without the server.")
+            self.server = False
+        returncode = self._call(command, client=False)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, f"sbt {command}")
+
+    @staticmethod
+    def shutdown(directory):
+        subprocess.call(f"cd {directory} && sbt --client shutdown", shell=True)
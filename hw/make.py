@@ -6,45 +6,417 @@
 # Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
 # SPDX-License-Identifier: BSD-2-Clause
 
-from cpu.core import VexiiRiscvCustom
-
-from litex.soc.cores import cpu
-
-cpu.CPUS.update({"vexiiriscv_custom": VexiiRiscvCustom})
-
 import os
-import re
 import sys
+import copy
+import time
 import argparse
 import shutil
+import traceback
+import contextlib
+import multiprocessing
 
-from litex.soc.integration.builder import Builder
-
-from socs.boards import *
-from socs.boards import SocBoard as Board
-from socs.board import CustomBoard
-from socs.soc_linux import SoCLinux
+# Only lightweight imports here: LiteX, the CPU and the boards are imported on demand (listing or
+# validating boards must stay fast).
+from socs.registry import get_boards, get_board
+from tools import trace
 
 # ---------------------------------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------------------------------
 
 
-def camel_to_snake(name):
-    name = re.sub(r"(?<=[a-z])(?=[A-Z])", "_", name)
-    return name.lower()
+def list_boards():
+    boards = get_boards()
+    print(f"{'Board':<32} {'Vendor':<10} Capabilities")
+    for name in sorted(boards):
+        board = boards[name]
+        capabilities = ", ".join(sorted(board.capabilities))
+        print(f"{name:<32} {board.vendor:<10} {capabilities}")
+
+
+def pipeline_steps(soc, pipeline):
+    # The CPU netlist is generated on the pipeline from finalize (during the software build), the
+    # gateware waits for it.
+    from cpu.core import VexiiRiscvCustom
+
+    VexiiRiscvCustom.pipeline = pipeline
+    pipeline.before(soc, "build", "netlist")
+
 
+def profile_until(obj, method, profiler):
+    # Stop the profiler (ExitStack) at the first call of obj.method.
+    func = getattr(obj, method)
 
-def get_supported_boards():
-    board_classes = {}
-    for name, obj in globals().items():
-        name = camel_to_snake(name)
-        if isinstance(obj, type) and issubclass(obj, Board) and obj is not Board:
-            board_classes[name] = obj
-    return board_classes
+    def stopping(*args, **kwargs):
+        profiler.close()
+        return func(*args, **kwargs)
 
+    setattr(obj, method, stopping)
+
+
+# ---------------------------------------------------------------------------------------------------
+# Board Build
+# ---------------------------------------------------------------------------------------------------
+
+
+def build_board(board_name, args):
+    trace.set_board(board_name)
+    with trace.phase("board"):
+        _build_board(board_name, args)
+
+
+def _build_board(board_name, args):
+    # args_read/board handling mutate args, work on a private copy.
+    args = copy.deepcopy(args)
+
+    from litex.soc.cores import cpu
+    from litex.soc.integration.builder import Builder
+
+    from cpu.core import VexiiRiscvCustom
+    from socs.boards import SocBoard as Board
+    from socs.board import CustomBoard
+    from tools.incremental import BitstreamCache
+    from tools.pipeline import Pipeline
+    from tools.ooc import ClusterCheckpoint
+    from tools.toolchain import parallelism
+    from tools import reports
+
+    cpu.CPUS.update({"vexiiriscv_custom": VexiiRiscvCustom})
+    VexiiRiscvCustom.trace = trace
+
+    board = get_board(board_name)()
+    soc_kwargs = dict(Board.soc_kwargs)
+    soc_kwargs.update(board.soc_kwargs)
+
+    # CPU parameters -------------------------------------------------------------------------------
+    if "usb_host" in board.soc_capabilities:
+        args.with_coherent_dma = True
+
+    with trace.phase("cpu-config"):
+        VexiiRiscvCustom.args_read(args)
+
+    # SoC parameters -------------------------------------------------------------------------------
+    if args.device is not None:
+        soc_kwargs.update(device=args.device)
+    if args.cpu_variant is not None:
+        soc_kwargs.update(variant=args.cpu_variant)
+    if args.toolchain is not None:
+        soc_kwargs.update(toolchain=args.toolchain)
+
+    # UART.
+    soc_kwargs["uart_baudrate"] = int(args.uart_baudrate)
+    if "crossover" in board.soc_capabilities:
+        soc_kwargs.update(uart_name="crossover")
+    if "usb_fifo" in board.soc_capabilities:
+        soc_kwargs.update(uart_name="usb_fifo")
+    if "usb_acm" in board.soc_capabilities:
+        soc_kwargs.update(uart_name="usb_acm")
+
+    # Peripherals
+    if "leds" in board.soc_capabilities:
+        soc_kwargs.update(with_led_chaser=True)
+    if "ethernet" in board.soc_capabilities:
+        soc_kwargs.update(with_ethernet=True)
+    if "pcie" in board.soc_capabilities:
+        soc_kwargs.update(with_pcie=True)
+    if "spiflash" in board.soc_capabilities:
+        soc_kwargs.update(with_spi_flash=True)
+    if "sata" in board.soc_capabilities:
+        soc_kwargs.update(with_sata=True)
+    if "video_terminal" in board.soc_capabilities:
+        soc_kwargs.update(with_video_terminal=True)
+    if "framebuffer" in board.soc_capabilities:
+        soc_kwargs.update(with_video_framebuffer=True)
+    if "usb_host" in board.soc_capabilities:
+        soc_kwargs.update(with_usb_host=True)
+    if args.cfu:
+        soc_kwargs.update(cpu_cfu=args.cfu)
+    cxus = args.cxu
+    if len(cxus) > 0:
+        soc_kwargs.update(cxus=cxus)
+
+    # SoC creation ---------------------------------------------------------------------------------
+    # soc = SoCLinux(board.soc_cls, **soc_kwargs)
+    # --profile: elaboration, finalize and Verilog generation, up to the toolchain run (or the end
+    # of the build).
+    profiler = contextlib.ExitStack()
+    profile_file = os.path.join("build", board_name, "profile")
+    profiler.enter_context(trace.profile(profile_file, args.profile))
+    with trace.phase("elaboration"):
+        soc = CustomBoard(board.soc_cls, **soc_kwargs)
+    board.platform = soc.platform
+
+    # SoC constants --------------------------------------------------------------------------------
+    for k, v in board.soc_constants.items():
+        soc.add_constant(k, v)
+
+    # SoC peripherals ------------------------------------------------------------------------------
+    if board_name in ["arty", "arty_a7"]:
+        from litex_boards.platforms.digilent_arty import _sdcard_pmod_io
+
+        board.platform.add_extension(_sdcard_pmod_io)
+
+    if board_name in ["aesku40"]:
+        from litex_boards.platforms.avnet_aesku40 import _sdcard_pmod_io
+
+        board.platform.add_extension(_sdcard_pmod_io)
+
+    if board_name in ["orange_crab"]:
+        from litex_boards.platforms.gsd_orangecrab import feather_i2c
+
+        board.platform.add_extension(feather_i2c)
+
+    if "spisdcard" in board.soc_capabilities:
+        soc.add_spi_sdcard()
+    if "sdcard" in board.soc_capabilities:
+        soc.add_sdcard()
+    if "ethernet" in board.soc_capabilities:
+        soc.configure_ethernet(remote_ip=args.remote_ip)
+    # if "leds" in board.soc_capabilities:
+    #    soc.add_leds()
+    if "rgb_led" in board.soc_capabilities:
+        soc.add_rgb_led()
+    if "switches" in board.soc_capabilities:
+        soc.add_switches()
+    if "spi" in board.soc_capabilities:
+        soc.add_spi(args.spi_data_width, args.spi_clk_freq)
+    if "i2c" in board.soc_capabilities:
+        soc.add_i2c()
+
+    # Build ----------------------------------------------------------------------------------------
+    build_dir = os.path.join("build", board_name)
+    builder = Builder(
+        soc,
+        output_dir=os.path.join("build", board_name),
+        bios_console="lite",
+        csr_json=os.path.join(build_dir, "csr.json"),
+        csr_csv=os.path.join(build_dir, "csr.csv"),
+    )
+    if args.ooc_cpu:
+        checkpoint = ClusterCheckpoint(VexiiRiscvCustom.netlist_cache())
+        checkpoint.install(soc.platform, soc.cpu)
+    bitstream_cache = BitstreamCache(os.path.join(build_dir, "bitstreams"), args.force)
+    bitstream_cache.install(soc.platform)
+    trace.wrap(soc, "finalize", "finalize")
+    trace.wrap(builder, "_generate_rom_software", "software")
+    trace.wrap(soc, "build", "gateware")
+    trace.wrap(soc.platform.toolchain, "run_script", "toolchain")
+    profile_until(soc.platform.toolchain, "run_script", profiler)
+
+    # DTS/DTB (only need csr.json: built with the software) ----------------------------------------
+    if hasattr(soc, "get_fdtoverlays"):
+        fdtoverlays = soc.get_fdtoverlays(board_name, args.fdtoverlays)
+    else:
+        fdtoverlays = args.fdtoverlays
+
+    def dts():
+        soc.generate_dts(board_name)
+        soc.compile_dts(board_name, fdtoverlays)
+
+    def dtb():
+        if args.shared_images:
+            soc.combine_dtb(board_name, fdtoverlays)
+        else:
+            # --jobs build: sw/linux/images is shared by the boards, DTB kept per board.
+            os.makedirs(os.path.join(build_dir, "images"), exist_ok=True)
+            soc.combine_dtb(board_name, fdtoverlays, dst_prefix=build_dir + "/")
+
+    reports.enable(soc.platform.toolchain, board_name)
+    pipeline = Pipeline(args.pipeline_threads)
+    pipeline_steps(soc, pipeline)
+    pipeline.after(builder, "_generate_csr_map", "dts", dts)
+    pipeline.after(builder, "_generate_csr_map", "dtb", dtb, deps=["dts"])
+    # DTS/DTB paths are relative to the working directory, that the toolchain changes: done
+    # alongside the software build, before the gateware's.
+    pipeline.before(soc, "build", "dts", "dtb")
+    try:
+        builder.build(
+            run=args.build,
+            build_name=board_name,
+            **parallelism(soc.platform.toolchain, args.threads),
+        )
+    finally:
+        profiler.close()
+        pipeline.join()
+
+    # Utilisation/timing report (toolchain run by this build) --------------------------------------
+    if args.build and not bitstream_cache.restored and args.report_db:
+        record = reports.build_record(
+            builder.gateware_dir,
+            board_name,
+            board=board_name,
+            toolchain=type(soc.platform.toolchain).__name__,
+            cpu_config=soc.cpu.netlist_name,
+            vexii_args=soc.cpu.vexii_args.split(),
+            cxus=args.cxu,
+        )
+        if record is None:
+            print("No toolchain reports found, build not recorded.")
+        else:
+            record = reports.append(args.report_db, record)
+            print(f"Build recorded as #{record['id']} in {args.report_db}.")
+
+    # boot.json ------------------------------------------------------------------------------------
+    if args.shared_images:
+        shutil.copyfile(
+            f"sw/linux/images/boot_{args.rootfs}.json", "sw/linux/images/boot.json"
+        )
+
+    # PCIe Driver ----------------------------------------------------------------------------------
+    if "pcie" in board.soc_capabilities:
+        from litepcie.software import generate_litepcie_software
+
+        with trace.phase("pcie-driver"):
+            generate_litepcie_software(soc, os.path.join(builder.output_dir, "driver"))
+
+    # Load FPGA bitstream --------------------------------------------------------------------------
+    if args.load:
+        board.load(filename=builder.get_bitstream_filename(mode="sram"))
+
+    # Flash bitstream/images (to SPI Flash) --------------------------------------------------------
+    if args.flash:
+        board.flash(filename=builder.get_bitstream_filename(mode="flash"))
+
+    # Generate SoC documentation -------------------------------------------------------------------
+    if args.doc:
+        soc.generate_doc(board_name)
+
+
+# ---------------------------------------------------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------------------------------------------------
+
+
+def build_sim(args):
+    args = copy.deepcopy(args)
+
+    from litex.soc.cores import cpu
+    from litex.soc.integration.builder import Builder
+
+    from cpu.core import VexiiRiscvCustom
+    from socs.board import CustomBoard
+    from socs.boards import SocBoard as Board
+    from socs.sim import SimBoard
+    from tools.pipeline import Pipeline
+
+    cpu.CPUS.update({"vexiiriscv_custom": VexiiRiscvCustom})
+    VexiiRiscvCustom.trace = trace
+
+    trace.set_board("sim")
+    board = SimBoard(ram_init=args.sim_ram_init)
+    soc_kwargs = dict(Board.soc_kwargs)
+    soc_kwargs.update(board.soc_kwargs)
+
+    # CPU parameters -------------------------------------------------------------------------------
+    with trace.phase("cpu-config"):
+        VexiiRiscvCustom.args_read(args)
+
+    # SoC parameters -------------------------------------------------------------------------------
+    soc_kwargs.update(variant=args.cpu_variant)
+    soc_kwargs["uart_baudrate"] = int(args.uart_baudrate)
+    if args.cfu:
+        soc_kwargs.update(cpu_cfu=args.cfu)
+    if len(args.cxu) > 0:
+        soc_kwargs.update(cxus=args.cxu)
+
+    # SoC creation ---------------------------------------------------------------------------------
+    with trace.phase("elaboration"):
+        soc = CustomBoard(board.soc_cls, **soc_kwargs)
+    board.configure(soc)
+
+    # Build/Run ------------------------------------------------------------------------------------
+    build_dir = os.path.join("build", "sim")
+    builder = Builder(
+        soc,
+        output_dir=build_dir,
+        csr_json=os.path.join(build_dir, "csr.json"),
+        csr_csv=os.path.join(build_dir, "csr.csv"),
+    )
+    trace.wrap(soc, "finalize", "finalize")
+    trace.wrap(builder, "_generate_rom_software", "software")
+    pipeline = Pipeline(args.pipeline_threads)
+    pipeline_steps(soc, pipeline)
+    try:
+        with trace.phase("simulation"):
+            builder.build(sim_config=board.sim_config(), opt_level="O3")
+    finally:
+        pipeline.join()
+
+
+# ---------------------------------------------------------------------------------------------------
+# Parallel Build
+# ---------------------------------------------------------------------------------------------------
+
+
+def build_board_worker(board_name, args):
+    # Runs in a fresh (spawned) process: redirect stdout/stderr, including the output of
+    # sub-processes (sbt, toolchains), to a per-board log file.
+    log_filename = os.path.join("build", board_name, "make.log")
+    os.makedirs(os.path.dirname(log_filename), exist_ok=True)
+    start = time.time()
+    error = ""
+    with open(log_filename, "w") as log:
+        os.dup2(log.fileno(), sys.stdout.fileno())
+        os.dup2(log.fileno(), sys.stderr.fileno())
+        try:
+            build_board(board_name, args)
+        except BaseException as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}".splitlines()[0]
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+    return board_name, error, time.time() - start, log_filename, trace.events()
+
+
+def build_boards_parallel(board_names, args):
+    # One process per board (maxtasksperchild=1) so that the class-level CPU configuration
+    # always starts from a clean import.
+    from cpu.core import VexiiRiscvCustom
+
+    results = []
+    # Toolchain threads shared by the boards building at the same time.
+    args = copy.deepcopy(args)
+    args.threads = max(1, args.threads // min(args.jobs, len(board_names)))
+    # Shared by the boards: VexiiRiscv checkout set up once here, boot.json copied here and DTBs
+    # kept per board (build/<board>/images/rv32.dtb).
+    with trace.phase("git-setup"):
+        VexiiRiscvCustom.git_setup(args.vexii_revision, args.update_repo)
+    args.vexii_checkout_ready = True
+    shutil.copyfile(
+        f"sw/linux/images/boot_{args.rootfs}.json", "sw/linux/images/boot.json"
+    )
+    args.shared_images = False
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=args.jobs, maxtasksperchild=1) as pool:
+        tasks = [(board_name, args) for board_name in board_names]
+        for result in pool.imap_unordered(_build_board_worker_star, tasks):
+            board_name, error, duration, log_filename, events = result
+            trace.add_events(events)
+            status = "failed" if error else "ok"
+            progress = f"[{len(results) + 1}/{len(tasks)}]"
+            print(f"{progress} {board_name}: {status} ({duration:.0f}s)")
+            results.append(result)
+
+    # Summary.
+    print()
+    print(f"{'Board':<32} {'Status':<8} {'Time':>8}  Log")
+    for board_name, error, duration, log_filename, _ in sorted(results):
+        status = "failed" if error else "ok"
+        minutes, seconds = divmod(int(duration), 60)
+        elapsed = f"{minutes}m{seconds:02d}s"
+        print(f"{board_name:<32} {status:<8} {elapsed:>8}  {log_filename}")
+        if error:
+            print(f"{'':<32} {error}")
+    failed = [r for r in results if r[1]]
+    print(f"\n{len(results) - len(failed)}/{len(results)} board(s) built successfully.")
+    return len(failed) == 0
+
+
+def _build_board_worker_star(task):
+    return build_board_worker(*task)
 
-supported_boards = get_supported_boards()
 
 # ---------------------------------------------------------------------------------------------------
 # Build
@@ -54,12 +426,17 @@ supported_boards = get_supported_boards()
 def main():
     description = "Linux on LiteX-VexRiscv\n\n"
     description += "Available boards:\n"
-    for name in sorted(supported_boards.keys()):
+    for name in sorted(get_boards()):
         description += "- " + name + "\n"
     parser = argparse.ArgumentParser(
-        description=description, formatter_class=argparse.RawTextHelpFormatter
+        description=description,
+        formatter_class=argparse.RawTextHelpFormatter,
+        add_help=False,
+    )
+    parser.add_argument("--board", default=None, help="FPGA board (or all).")
+    parser.add_argument(
+        "--list-boards", action="store_true", help="List supported boards and exit."
     )
-    parser.add_argument("--board", required=True, help="FPGA board.")
     parser.add_argument("--device", default=None, help="FPGA device.")
     parser.add_argument("--cpu-variant", default=None, help="FPGA board variant.")
     parser.add_argument("--toolchain", default=None, help="Toolchain use to build.")
@@ -71,6 +448,23 @@ def main():
     parser.add_argument(
         "--flash", action="store_true", help="Flash bitstream/images (to Flash)."
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Always run the toolchain (ignore bitstreams of identical previous builds).",
+    )
+    parser.add_argument(
+        "--ooc-cpu",
+        action="store_true",
+        help="Synthesize the CPU cluster out of context once (cached) and link it into the "
+        "top-level synthesis (Yosys/nextpnr ECP5/iCE40, Vivado).",
+    )
+    parser.add_argument(
+        "--report-db",
+        default=os.path.join("build", "reports.jsonl"),
+        help="Append each build's utilisation/timing to this database (.jsonl, or SQLite "
+        "for .db/.sqlite, see tools/reports.py), empty: disabled.",
+    )
     parser.add_argument("--doc", action="store_true", help="Build documentation.")
     parser.add_argument("--local-ip", default="192.168.1.50", help="Local IP address.")
     parser.add_argument(
@@ -93,153 +487,104 @@ def main():
     )
     parser.add_argument("--cfu", default="", help="Path to CFU module")
     parser.add_argument(
-        "--cxu", action="append", default=[], help="Path to CXU L1 module"
+        "--cxu",
+        action="append",
+        default=[],
+        help="Path to CXU L1 module, with optional key=values (path,state_depth=N,"
+        "state_width=N,state_ports=N; defaults from <path>.json).",
+    )
+    parser.add_argument(
+        "--cxu-hub",
+        default="none",
+        choices=["none", "comb", "registered"],
+        help="Put all the CXUs behind a single CPU CXU bus, routed by cxu_id "
+        "(combinatorial or registered routing).",
+    )
+    parser.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        help="Number of boards to build in parallel (each in its own process).",
+    )
+    parser.add_argument(
+        "--threads",
+        default=os.cpu_count() or 1,
+        type=int,
+        help="Toolchain threads (nextpnr, Vivado, Quartus), divided between the boards of a "
+        "--jobs build (default: CPU count).",
+    )
+    parser.add_argument(
+        "--pipeline-threads",
+        default=4,
+        type=int,
+        help="Threads running independent build steps at the same time (CPU netlist, "
+        "software, DTS), 0: sequential build.",
+    )
+    parser.add_argument(
+        "--sim",
+        action="store_true",
+        help="Build and run a Verilator simulation of the SoC instead of a board.",
+    )
+    parser.add_argument(
+        "--sim-ram-init",
+        default=None,
+        help="Binary preloaded in main_ram and booted in simulation (e.g. a demo.bin).",
+    )
+    parser.add_argument(
+        "--trace-out",
+        default=None,
+        help="Write per-phase/per-board timings to this file (Chrome trace-event JSON).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile SoC elaboration, finalize and Verilog generation "
+        "(build/<board>/profile.html with pyinstrument, else profile.prof).",
+    )
+    args, _ = parser.parse_known_args()
+
+    # Board(s) listing/validation (no LiteX import) ------------------------------------------------
+    if args.list_boards:
+        list_boards()
+        return
+    with_help = {"-h", "--help"} & set(sys.argv[1:])
+    if args.board is None and not args.sim and not with_help:
+        parser.error("the following arguments are required: --board")
+    if args.sim and (args.load or args.flash):
+        parser.error("--load/--flash: the simulation has no bitstream.")
+    if args.board not in (None, "all") and args.board not in get_boards():
+        parser.error(f"unsupported board {args.board!r} (see --list-boards).")
+
+    # CPU options (imports the LiteX CPU) ----------------------------------------------------------
+    from cpu.core import VexiiRiscvCustom
+
+    parser.add_argument(
+        "-h", "--help", action="help", help="show this help message and exit"
     )
     VexiiRiscvCustom.args_fill(parser)
+    parser.set_defaults(shared_images=True)  # Per board DTBs in --jobs builds.
     args = parser.parse_args()
 
     # Board(s) selection ---------------------------------------------------------------------------
     if args.board == "all":
-        board_names = list(supported_boards.keys())
+        board_names = sorted(get_boards())
     else:
         board_names = [args.board]
 
     # Board(s) iteration ---------------------------------------------------------------------------
-    for board_name in board_names:
-        board = supported_boards[board_name]()
-        soc_kwargs = Board.soc_kwargs
-        soc_kwargs.update(board.soc_kwargs)
-
-        # CPU parameters ---------------------------------------------------------------------------
-        if "usb_host" in board.soc_capabilities:
-            args.with_coherent_dma = True
-
-        VexiiRiscvCustom.args_read(args)
-
-        # SoC parameters ---------------------------------------------------------------------------
-        if args.device is not None:
-            soc_kwargs.update(device=args.device)
-        if args.cpu_variant is not None:
-            soc_kwargs.update(variant=args.cpu_variant)
-        if args.toolchain is not None:
-            soc_kwargs.update(toolchain=args.toolchain)
-
-        # UART.
-        soc_kwargs["uart_baudrate"] = int(args.uart_baudrate)
-        if "crossover" in board.soc_capabilities:
-            soc_kwargs.update(uart_name="crossover")
-        if "usb_fifo" in board.soc_capabilities:
-            soc_kwargs.update(uart_name="usb_fifo")
-        if "usb_acm" in board.soc_capabilities:
-            soc_kwargs.update(uart_name="usb_acm")
-
-        # Peripherals
-        if "leds" in board.soc_capabilities:
-            soc_kwargs.update(with_led_chaser=True)
-        if "ethernet" in board.soc_capabilities:
-            soc_kwargs.update(with_ethernet=True)
-        if "pcie" in board.soc_capabilities:
-            soc_kwargs.update(with_pcie=True)
-        if "spiflash" in board.soc_capabilities:
-            soc_kwargs.update(with_spi_flash=True)
-        if "sata" in board.soc_capabilities:
-            soc_kwargs.update(with_sata=True)
-        if "video_terminal" in board.soc_capabilities:
-            soc_kwargs.update(with_video_terminal=True)
-        if "framebuffer" in board.soc_capabilities:
-            soc_kwargs.update(with_video_framebuffer=True)
-        if "usb_host" in board.soc_capabilities:
-            soc_kwargs.update(with_usb_host=True)
-        if args.cfu:
-            soc_kwargs.update(cpu_cfu=args.cfu)
-        cxus = args.cxu
-        if len(cxus) > 0:
-            soc_kwargs.update(cxus=cxus)
-
-        # SoC creation -----------------------------------------------------------------------------
-        # soc = SoCLinux(board.soc_cls, **soc_kwargs)
-        soc = CustomBoard(board.soc_cls, **soc_kwargs)
-        board.platform = soc.platform
-
-        # SoC constants ----------------------------------------------------------------------------
-        for k, v in board.soc_constants.items():
-            soc.add_constant(k, v)
-
-        # SoC peripherals --------------------------------------------------------------------------
-        if board_name in ["arty", "arty_a7"]:
-            from litex_boards.platforms.digilent_arty import _sdcard_pmod_io
-
-            board.platform.add_extension(_sdcard_pmod_io)
-
-        if board_name in ["aesku40"]:
-            from litex_boards.platforms.avnet_aesku40 import _sdcard_pmod_io
-
-            board.platform.add_extension(_sdcard_pmod_io)
-
-        if board_name in ["orange_crab"]:
-            from litex_boards.platforms.gsd_orangecrab import feather_i2c
-
-            board.platform.add_extension(feather_i2c)
-
-        if "spisdcard" in board.soc_capabilities:
-            soc.add_spi_sdcard()
-        if "sdcard" in board.soc_capabilities:
-            soc.add_sdcard()
-        if "ethernet" in board.soc_capabilities:
-            soc.configure_ethernet(remote_ip=args.remote_ip)
-        # if "leds" in board.soc_capabilities:
-        #    soc.add_leds()
-        if "rgb_led" in board.soc_capabilities:
-            soc.add_rgb_led()
-        if "switches" in board.soc_capabilities:
-            soc.add_switches()
-        if "spi" in board.soc_capabilities:
-            soc.add_spi(args.spi_data_width, args.spi_clk_freq)
-        if "i2c" in board.soc_capabilities:
-            soc.add_i2c()
-
-        # Build ------------------------------------------------------------------------------------
-        build_dir = os.path.join("build", board_name)
-        builder = Builder(
-            soc,
-            output_dir=os.path.join("build", board_name),
-            bios_console="lite",
-            csr_json=os.path.join(build_dir, "csr.json"),
-            csr_csv=os.path.join(build_dir, "csr.csv"),
-        )
-        builder.build(run=args.build, build_name=board_name)
-
-        # DTS --------------------------------------------------------------------------------------
-        soc.generate_dts(board_name)
-        if hasattr(soc, "get_fdtoverlays"):
-            fdtoverlays = soc.get_fdtoverlays(board_name, args.fdtoverlays)
+    try:
+        if args.sim:
+            build_sim(args)
+        elif args.jobs > 1 and len(board_names) > 1:
+            if not build_boards_parallel(board_names, args):
+                sys.exit(1)
         else:
-            fdtoverlays = args.fdtoverlays
-        soc.compile_dts(board_name, fdtoverlays)
-
-        # DTB --------------------------------------------------------------------------------------
-        soc.combine_dtb(board_name, fdtoverlays)
-
-        # boot.json --------------------------------------------------------------------------------
-        shutil.copyfile(f"sw/linux/images/boot_{args.rootfs}.json", "sw/linux/images/boot.json")
-
-        # PCIe Driver ------------------------------------------------------------------------------
-        if "pcie" in board.soc_capabilities:
-            from litepcie.software import generate_litepcie_software
-
-            generate_litepcie_software(soc, os.path.join(builder.output_dir, "driver"))
-
-        # Load FPGA bitstream ----------------------------------------------------------------------
-        if args.load:
-            board.load(filename=builder.get_bitstream_filename(mode="sram"))
-
-        # Flash bitstream/images (to SPI Flash) ----------------------------------------------------
-        if args.flash:
-            board.flash(filename=builder.get_bitstream_filename(mode="flash"))
-
-        # Generate SoC documentation ---------------------------------------------------------------
-        if args.doc:
-            soc.generate_doc(board_name)
+            for board_name in board_names:
+                build_board(board_name, args)
+    finally:
+        VexiiRiscvCustom.sbt_shutdown(args)
+        if args.trace_out:
+            trace.write(args.trace_out, trace.events())
 
 
 if __name__ == "__main__":
@@ -1 +1,7 @@
-from .soc_linux import SoCLinux
+# Resolved on first use: importing the package (e.g. for socs.registry) must not import LiteX.
+def __getattr__(name):
+    if name == "SoCLinux":
+        from .soc_linux import SoCLinux
+
+        return SoCLinux
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
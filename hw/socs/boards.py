@@ -279,7 +279,7 @@ def add_cpu(
     from litex.soc.interconnect import wishbone
     from litex.soc.interconnect import axi
     from litex.soc.interconnect import ahb
-    from litex.soc.integration.soc import SoCIORegion
+    from litex.soc.integration.soc import SoCIORegion, SoCRegion, SoCError, SoCBusHandler
     from litex.soc.cores import cpu
 
     print("##############################PATCHED ADD CPU##############################")
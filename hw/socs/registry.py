@@ -0,0 +1,93 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import ast
+from typing import NamedTuple
+from functools import lru_cache
+
+# Board Registry -----------------------------------------------------------------------------------
+
+# Static view of the boards defined in boards.py.
+#
+# boards.py is parsed (not imported) to get each board's name, vendor, litex_boards target and
+# capabilities, so listing/validating boards doesn't import LiteX. The board class, and with it
+# its litex_boards.targets module, is only imported by get_board() for the selected board.
+
+
+class BoardInfo(NamedTuple):
+    name: str
+    cls_name: str
+    vendor: str
+    target: str
+    capabilities: frozenset
+
+
+def camel_to_snake(name):
+    name = re.sub(r"(?<=[a-z])(?=[A-Z])", "_", name)
+    return name.lower()
+
+
+def _parse_init(cls_node):
+    target = None
+    capabilities = None
+    for node in ast.walk(cls_node):
+        if isinstance(node, ast.ImportFrom) and node.module == "litex_boards.targets":
+            target = node.names[0].name
+        if isinstance(node, ast.keyword) and node.arg == "soc_capabilities":
+            capabilities = frozenset(ast.literal_eval(node.value))
+    return target, capabilities
+
+
+@lru_cache(maxsize=None)
+def get_boards():
+    filename = os.path.join(os.path.dirname(__file__), "boards.py")
+    with open(filename) as f:
+        source = f.read()
+
+    # Vendor sections ("# Xilinx SocBoards" banners).
+    vendors = []
+    for lineno, line in enumerate(source.splitlines(), start=1):
+        m = re.match(r"^# (\w+) SocBoards$", line)
+        if m:
+            vendors.append((lineno, m.group(1).lower()))
+
+    boards = {}
+    classes = {}
+    for node in ast.parse(source, filename).body:
+        if not isinstance(node, ast.ClassDef) or node.name == "SocBoard":
+            continue
+        bases = [b.id for b in node.bases if isinstance(b, ast.Name)]
+        if not bases or (bases[0] != "SocBoard" and bases[0] not in classes):
+            continue
+        target, capabilities = _parse_init(node)
+        if bases[0] in classes:  # Inherit from parent board.
+            parent = classes[bases[0]]
+            target = target or parent.target
+            capabilities = (
+                capabilities if capabilities is not None else parent.capabilities
+            )
+        vendor = "unknown"
+        for lineno, v in vendors:
+            if lineno < node.lineno:
+                vendor = v
+        info = BoardInfo(
+            name=camel_to_snake(node.name),
+            cls_name=node.name,
+            vendor=vendor,
+            target=target,
+            capabilities=capabilities or frozenset(),
+        )
+        classes[node.name] = info
+        boards[info.name] = info
+    return boards
+
+
+def get_board(name):
+    from . import boards
+
+    return getattr(boards, get_boards()[name].cls_name)
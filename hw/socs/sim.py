@@ -0,0 +1,44 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+from .boards import SocBoard
+
+# Simulation SocBoard ------------------------------------------------------------------------------
+
+# litex_sim's SimSoC (Verilator) with the same CPU/CFU/CXU configuration as the boards: the
+# demo binary is preloaded in main_ram, the BIOS boots it (ROM_BOOT_ADDRESS) and its UART is
+# connected to the console.
+
+
+class SimBoard(SocBoard):
+    soc_kwargs = {
+        "uart_name": "sim",
+        "integrated_main_ram_size": 0x100000,
+    }
+
+    def __init__(self, ram_init=None):
+        from litex.tools.litex_sim import SimSoC
+        from litex.soc.integration.common import get_mem_data
+
+        SocBoard.__init__(self, SimSoC, soc_capabilities={"serial"})
+        self.soc_kwargs = dict(self.soc_kwargs)
+        if ram_init is not None:
+            self.soc_kwargs["integrated_main_ram_init"] = get_mem_data(
+                ram_init, endianness="little"
+            )
+
+    def configure(self, soc):
+        if self.soc_kwargs.get("integrated_main_ram_init"):
+            soc.add_constant("ROM_BOOT_ADDRESS", soc.mem_map["main_ram"])
+
+    @staticmethod
+    def sim_config():
+        from litex.build.sim.config import SimConfig
+
+        sim_config = SimConfig()
+        sim_config.add_clocker("sys_clk", freq_hz=int(1e6))  # SimSoC's sys_clk_freq.
+        sim_config.add_module("serial2console", "serial")
+        return sim_config
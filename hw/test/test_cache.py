@@ -0,0 +1,36 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import tempfile
+import unittest
+
+from cpu.cache import NetlistCache
+
+
+class TestNetlistCache(unittest.TestCase):
+    def test_relative_directory(self):
+        # Staging directories are used from another working directory (cd to the checkout).
+        with tempfile.TemporaryDirectory() as root:
+            cwd = os.getcwd()
+            os.chdir(root)
+            try:
+                cache = NetlistCache("cache", max_size=1 << 20)
+                staging = cache.staging()
+                os.makedirs("checkout")
+                os.chdir("checkout")
+                self.assertTrue(os.path.isabs(staging))
+                with open(os.path.join(staging, "netlist.v"), "w") as f:
+                    f.write("module netlist; endmodule\n")
+                path = cache.store(cache.key("netlist"), staging)
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(cache.lookup(cache.key("netlist")), path)
+            self.assertTrue(os.path.exists(os.path.join(path, "netlist.v")))
+
+
+if __name__ == "__main__":
+    unittest.main()
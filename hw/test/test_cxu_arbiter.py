@@ -0,0 +1,56 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import unittest
+
+from migen import *
+
+from cpu.cxu import CxuConfig, cxu_bus_layout, cxu_state_layout
+from cpu.cxu_arbiter import CxuHartArbiter
+
+
+class TestCxuHartArbiter(unittest.TestCase):
+    def test_stalled_command_stable(self):
+        # Two harts requesting while the CXU stalls cmd: the CXU-side command must not change.
+        config = CxuConfig(filename="cxu.v")
+        cxu_bus = Record(cxu_bus_layout(config))
+        cxu_states = [Record(cxu_state_layout(config))]
+        harts = [
+            (
+                Record(cxu_bus_layout(config)),
+                [Record(cxu_state_layout(config, cpu=True))],
+                Signal(32),
+            )
+            for _ in range(2)
+        ]
+        dut = CxuHartArbiter(cxu_bus, cxu_states, Signal(32), harts)
+
+        def generator():
+            for h, (bus, _, selector) in enumerate(harts):
+                yield bus.cmd.valid.eq(1)
+                yield bus.cmd.payload.inputs_0.eq(0x100 + h)
+                yield selector.eq(h)
+            yield cxu_bus.cmd.ready.eq(0)
+            yield
+            inputs_0 = yield cxu_bus.cmd.payload.inputs_0
+            for _ in range(8):
+                self.assertEqual((yield cxu_bus.cmd.valid), 1)
+                self.assertEqual((yield cxu_bus.cmd.payload.inputs_0), inputs_0)
+                yield
+            # The command fires, the other hart is granted once the response is accepted.
+            yield cxu_bus.cmd.ready.eq(1)
+            yield cxu_bus.rsp.valid.eq(1)
+            yield harts[inputs_0 & 1][0].rsp.ready.eq(1)
+            yield
+            yield harts[inputs_0 & 1][0].cmd.valid.eq(0)
+            yield
+            self.assertEqual((yield cxu_bus.cmd.payload.inputs_0), inputs_0 ^ 1)
+
+        run_simulation(dut, generator())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import tempfile
+import unittest
+
+from migen import *
+
+from litex.build.generic_platform import Pins
+from litex.build.lattice import LatticeiCE40Platform
+
+from tools import reports
+from tools.toolchain import parallelism
+
+
+class TestToolchainOptions(unittest.TestCase):
+    def test_ice40_nextpnr_options(self):
+        # The iCE40 toolchain's finalize() resets its nextpnr options.
+        io = [("clk", 0, Pins("35")), ("led", 0, Pins("11"))]
+        platform = LatticeiCE40Platform("ice40-up5k-sg48", io, toolchain="icestorm")
+        module = Module()
+        module.clock_domains.cd_sys = ClockDomain("sys")
+        module.comb += module.cd_sys.clk.eq(platform.request("clk"))
+        led = platform.request("led")
+        module.sync += led.eq(~led)
+
+        self.assertEqual(parallelism(platform.toolchain, 6), {})
+        reports.enable(platform.toolchain, "top")
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as build_dir:
+            try:
+                platform.build(module, build_dir=build_dir, build_name="top", run=False)
+            finally:
+                os.chdir(cwd)
+            with open(os.path.join(build_dir, "build_top.sh")) as f:
+                script = f.read()
+        self.assertIn("--threads 6", script)
+        self.assertIn("--report top_report.json", script)
+
+
+if __name__ == "__main__":
+    unittest.main()
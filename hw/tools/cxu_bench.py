@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import json
+import random
+import argparse
+import subprocess
+
+# CXU Microbenchmark -------------------------------------------------------------------------------
+
+# Cycle-level benchmark of a CXU module in isolation (Verilator).
+#
+# The module's ports are parsed from its Verilog file and a C++ testbench is generated for it: it
+# streams commands at full rate (cmd_valid held as long as commands are left), honours cmd_ready
+# and rsp_ready (optionally deasserted at random to apply backpressure), models the state memory
+# the CPU provides to the CXU and logs, for each op, the cycles at which its command and its
+# response were accepted. Responses are matched to commands in order or, for CXUs with request
+# tags (cmd/rsp_payload_tag), by tag, up to --outstanding commands in flight. The testbench is
+# compiled once per module; stimulus (random per function_id, or recorded) is read at run time.
+
+# Port parsing -------------------------------------------------------------------------------------
+
+
+def parse_ports(filename, top=None):
+    with open(filename) as f:
+        source = re.sub(r"/\*.*?\*/", "", f.read(), flags=re.S)
+    source = re.sub(r"//.*", "", source)
+    modules = re.findall(
+        r"\bmodule\s+(\w+)\s*(?:#\s*\(.*?\)\s*)?\((.*?)\)\s*;", source, re.S
+    )
+    if not modules:
+        raise ValueError(f"No module found in {filename}.")
+    for name, ports in modules:
+        if top is None or name == top:
+            break
+    else:
+        raise ValueError(f"Module {top} not found in {filename}.")
+    port_re = re.compile(
+        r"\b(input|output)\s+(?:wire\s+|reg\s+|logic\s+)?(?:signed\s+)?"
+        r"(?:\[\s*(\d+)\s*:\s*(\d+)\s*\]\s*)?(\w+)"
+    )
+    directions = {}
+    widths = {}
+    for direction, msb, lsb, port in port_re.findall(ports):
+        directions[port] = direction
+        widths[port] = abs(int(msb or 0) - int(lsb or 0)) + 1
+    for port in ["cmd_valid", "cmd_ready", "rsp_valid", "rsp_ready", "clk", "reset"]:
+        if port not in directions:
+            raise ValueError(f"{name}: missing {port} port.")
+    return name, directions, widths
+
+
+# Testbench generation -----------------------------------------------------------------------------
+
+_TESTBENCH = """\
+// Auto-generated by cxu_bench.py.
+#include <cstdio>
+#include <cstdlib>
+#include <cstdint>
+#include <deque>
+#include <vector>
+#include "verilated.h"
+#include "V{top}.h"
+
+struct Op {{
+    uint32_t function_id, inputs_0, inputs_1, state_id;
+}};
+{state_decl}
+
+static void tick(V{top} *top, int clk) {{
+    top->clk = clk;
+    top->eval();
+{state_read}
+}}
+
+int main(int argc, char **argv) {{
+    // bench <stimulus> <results> <rsp_ready_percent> <seed>
+    Verilated::commandArgs(argc, argv);
+    FILE *stimulus = fopen(argv[1], "r");
+    FILE *results = fopen(argv[2], "w");
+    int rsp_ready_percent = atoi(argv[3]);
+    srand(atoi(argv[4]));
+
+    std::vector<Op> ops;
+    Op op;
+    while (fscanf(stimulus, "%u %u %u %u", &op.function_id, &op.inputs_0, &op.inputs_1, &op.state_id) == 4)
+        ops.push_back(op);
+
+    V{top} *top = new V{top};
+
+    // Reset.
+    top->reset = 1;
+    top->cmd_valid = 0;
+    top->rsp_ready = 0;
+    for (int i = 0; i < 8; i++) {{
+        tick(top, 0);
+        tick(top, 1);
+    }}
+    top->reset = 0;
+
+    // Run.
+    size_t issued = 0, completed = 0;
+{outstanding_decl}
+    uint64_t cycle = 0, idle = 0;
+    while (completed < ops.size()) {{
+        bool cmd_valid = {cmd_valid};
+        if (cmd_valid) {{
+            const Op &o = ops[issued];
+            top->cmd_payload_function_id = o.function_id;
+            top->cmd_payload_inputs_0 = o.inputs_0;
+            top->cmd_payload_inputs_1 = o.inputs_1;
+{cmd_extra}
+        }}
+        top->cmd_valid = cmd_valid;
+        top->rsp_ready = (rand() % 100) < rsp_ready_percent;
+        tick(top, 0);
+
+        // Command recorded first: a response in the same cycle (combinational CXU) is its own.
+        bool cmd_fire = cmd_valid && top->cmd_ready;
+        if (cmd_fire) {{
+{cmd_issue}
+        }}
+        bool rsp_fire = top->rsp_valid && top->rsp_ready && {rsp_pending};
+        if (rsp_fire) {{
+{rsp_match}
+            fprintf(results, "%zu %u %llu %llu %u\\n", o.first, ops[o.first].function_id,
+                (unsigned long long)o.second, (unsigned long long)cycle,
+                (unsigned)top->rsp_payload_outputs_0);
+            completed++;
+        }}
+{state_write}
+        tick(top, 1);
+        cycle++;
+
+        idle = (cmd_fire || rsp_fire) ? 0 : idle + 1;
+        if (idle > {timeout}) {{
+            fprintf(stderr, "CXU stalled at cycle %llu (%zu/%zu ops completed).\\n",
+                (unsigned long long)cycle, completed, ops.size());
+            return 1;
+        }}
+    }}
+    fclose(results);
+    delete top;
+    return 0;
+}}
+"""
+
+
+def _c_type(width):
+    if width <= 32:
+        return "uint32_t"
+    if width <= 64:
+        return "uint64_t"
+    return None
+
+
+def generate_testbench(top, directions, widths, outstanding=None, timeout=100000):
+    if "cmd_payload_tag" in directions:
+        # Tagged: up to `outstanding` commands in flight, responses matched by tag.
+        tags = 1 << widths["cmd_payload_tag"]
+        tags = tags if outstanding is None else min(outstanding, tags)
+        outstanding_decl = [
+            f"    std::vector<std::pair<size_t, uint64_t>> outstanding({tags});",
+            "    std::deque<uint32_t> free_tags;",
+            f"    for (uint32_t t = 0; t < {tags}; t++)",
+            "        free_tags.push_back(t);",
+        ]
+        cmd_valid = "issued < ops.size() && !free_tags.empty()"
+        rsp_pending = f"free_tags.size() < {tags}"
+        rsp_match = [
+            "            uint32_t tag = top->rsp_payload_tag;",
+            "            std::pair<size_t, uint64_t> o = outstanding[tag];",
+            "            free_tags.push_back(tag);",
+        ]
+        cmd_issue = [
+            "            outstanding[free_tags.front()] = std::make_pair(issued++, cycle);",
+            "            free_tags.pop_front();",
+        ]
+    else:
+        # Untagged: responses in command order.
+        outstanding_decl = ["    std::deque<std::pair<size_t, uint64_t>> outstanding;"]
+        cmd_valid = "issued < ops.size()"
+        rsp_pending = "!outstanding.empty()"
+        rsp_match = [
+            "            std::pair<size_t, uint64_t> o = outstanding.front();",
+            "            outstanding.pop_front();",
+        ]
+        cmd_issue = [
+            "            outstanding.push_back(std::make_pair(issued++, cycle));"
+        ]
+
+    cmd_extra = []
+    if "cmd_payload_state_id" in directions:
+        cmd_extra.append("            top->cmd_payload_state_id = o.state_id;")
+    if "cmd_payload_cxu_id" in directions:
+        cmd_extra.append("            top->cmd_payload_cxu_id = 0;")
+    if "cmd_payload_ready" in directions:
+        cmd_extra.append("            top->cmd_payload_ready = 1;")
+    if "cmd_payload_tag" in directions:
+        cmd_extra.append("            top->cmd_payload_tag = free_tags.front();")
+
+    state_decl = []
+    state_read = []
+    state_write = []
+    if "state_read_addr" in directions:
+        # Word-addressed state memory, asynchronous read (as provided by the CPU).
+        data_type = _c_type(widths["state_read_data"])
+        if data_type is None:
+            raise ValueError(f"{top}: state_read_data wider than 64 bits.")
+        depth = 1 << widths["state_read_addr"]
+        state_decl.append(f"static std::vector<{data_type}> state({depth});")
+        state_read.append("    top->state_read_data = state[top->state_read_addr];")
+        state_read.append("    top->eval();")
+        state_write.append("        if (top->state_write_en)")
+        state_write.append(
+            "            state[top->state_write_addr] = top->state_write_data;"
+        )
+    elif "state_read" in directions:
+        # Whole-state register (state_read/state_write vectors).
+        width = widths["state_read"]
+        if _c_type(width) is not None:
+            state_decl.append(f"static {_c_type(width)} state = 0;")
+            state_read.append("    top->state_read = state;")
+            state_write.append("        if (top->state_write_en)")
+            state_write.append("            state = top->state_write;")
+        else:
+            words = (width + 31) // 32
+            state_decl.append(f"static uint32_t state[{words}] = {{0}};")
+            state_read.append(f"    for (int i = 0; i < {words}; i++)")
+            state_read.append("        top->state_read[i] = state[i];")
+            state_write.append("        if (top->state_write_en)")
+            state_write.append(f"            for (int i = 0; i < {words}; i++)")
+            state_write.append("                state[i] = top->state_write[i];")
+        state_read.append("    top->eval();")
+    return _TESTBENCH.format(
+        top=top,
+        outstanding_decl="\n".join(outstanding_decl),
+        cmd_valid=cmd_valid,
+        rsp_pending=rsp_pending,
+        rsp_match="\n".join(rsp_match),
+        cmd_issue="\n".join(cmd_issue),
+        cmd_extra="\n".join(cmd_extra),
+        state_decl="\n".join(state_decl),
+        state_read="\n".join(state_read),
+        state_write="\n".join(state_write),
+        timeout=timeout,
+    )
+
+
+def build_testbench(
+    filename, top, build_dir, directions, widths, outstanding=None, verbose=False
+):
+    os.makedirs(build_dir, exist_ok=True)
+    testbench = os.path.join(build_dir, "bench.cpp")
+    with open(testbench, "w") as f:
+        f.write(generate_testbench(top, directions, widths, outstanding))
+    cmd = [
+        "verilator",
+        "--cc",
+        "--exe",
+        "--build",
+        "-O3",
+        "-Wno-fatal",
+        "--top-module",
+        top,
+        "--Mdir",
+        os.path.join(build_dir, "obj_dir"),
+        "-o",
+        "bench",
+        os.path.abspath(filename),
+        os.path.abspath(testbench),
+    ]
+    if verbose:
+        print(" ".join(cmd))
+    subprocess.check_call(cmd, stdout=None if verbose else subprocess.DEVNULL)
+    return os.path.join(build_dir, "obj_dir", "bench")
+
+
+# Stimulus -----------------------------------------------------------------------------------------
+
+
+def random_stimulus(function_id, ops, widths, rng):
+    state_mask = (1 << widths.get("cmd_payload_state_id", 1)) - 1
+    return [
+        (
+            function_id,
+            rng.getrandbits(32),
+            rng.getrandbits(32),
+            rng.randint(0, state_mask),
+        )
+        for _ in range(ops)
+    ]
+
+
+def load_stimulus(filename):
+    # Recorded command stream: one "function_id inputs_0 inputs_1 [state_id]" per line.
+    stimulus = []
+    with open(filename) as f:
+        for line in f:
+            fields = line.split("#")[0].replace(",", " ").split()
+            if fields:
+                values = [int(v, 0) for v in fields] + [0]
+                stimulus.append(tuple(values[:4]))
+    return stimulus
+
+
+def run(bench, stimulus, build_dir, rsp_ready, seed):
+    stimulus_file = os.path.join(build_dir, "stimulus.txt")
+    results_file = os.path.join(build_dir, "results.txt")
+    with open(stimulus_file, "w") as f:
+        for op in stimulus:
+            f.write(" ".join(str(v & 0xFFFFFFFF) for v in op) + "\n")
+    subprocess.check_call(
+        [bench, stimulus_file, results_file, str(rsp_ready), str(seed)]
+    )
+    with open(results_file) as f:
+        return [tuple(int(v) for v in line.split()) for line in f]
+
+
+# Statistics ---------------------------------------------------------------------------------------
+
+
+def statistics(results):
+    # results: (index, function_id, issue_cycle, response_cycle, output).
+    stats = {}
+    for function_id in sorted({r[1] for r in results}):
+        ops = sorted((r for r in results if r[1] == function_id), key=lambda r: r[2])
+        latencies = [r[3] - r[2] for r in ops]
+        first, last = ops[0][2], ops[-1][2]
+        span = max(r[3] for r in ops) - first + 1
+        stats[function_id] = {
+            "ops": len(ops),
+            "latency_min": min(latencies),
+            "latency_avg": sum(latencies) / len(ops),
+            "latency_max": max(latencies),
+            "ii": (last - first) / (len(ops) - 1) if len(ops) > 1 else None,
+            "cycles_per_op": span / len(ops),
+            "ops_per_cycle": len(ops) / span,
+        }
+    return stats
+
+
+def print_statistics(top, stats):
+    print(f"{top}:")
+    print(
+        f"{'function_id':>11} {'ops':>7} {'lat min':>8} {'lat avg':>8} {'lat max':>8} "
+        f"{'II':>6} {'cyc/op':>7} {'ops/cyc':>8}"
+    )
+    for function_id, s in stats.items():
+        ii = "-" if s["ii"] is None else f"{s['ii']:.2f}"
+        print(
+            f"{function_id:>11} {s['ops']:>7} {s['latency_min']:>8} "
+            f"{s['latency_avg']:>8.2f} {s['latency_max']:>8} {ii:>6} "
+            f"{s['cycles_per_op']:>7.2f} {s['ops_per_cycle']:>8.3f}"
+        )
+
+
+# Main ---------------------------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CXU cycle-level microbenchmark (Verilator)."
+    )
+    parser.add_argument("filename", help="CXU Verilog file.")
+    parser.add_argument(
+        "--top", default=None, help="CXU module (default: first module)."
+    )
+    parser.add_argument(
+        "--functions",
+        default=None,
+        help="Comma-separated function_ids to benchmark (default: 0-7).",
+    )
+    parser.add_argument(
+        "--ops", default=1000, type=int, help="Random ops per function_id."
+    )
+    parser.add_argument(
+        "--stimulus",
+        default=None,
+        help="Recorded command stream (function_id inputs_0 inputs_1 [state_id] per line).",
+    )
+    parser.add_argument(
+        "--rsp-ready",
+        default=100,
+        type=int,
+        help="Percentage of cycles with rsp_ready asserted (backpressure).",
+    )
+    parser.add_argument(
+        "--outstanding",
+        default=None,
+        type=int,
+        help="Max commands in flight for tagged CXUs (default: all tags).",
+    )
+    parser.add_argument("--seed", default=0, type=int, help="Random seed.")
+    parser.add_argument(
+        "--build-dir",
+        default=os.path.join("build", "cxu_bench"),
+        help="Build directory.",
+    )
+    parser.add_argument(
+        "--json", default=None, help="Write the statistics to a JSON file."
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show Verilator output.")
+    args = parser.parse_args()
+
+    top, directions, widths = parse_ports(args.filename, args.top)
+    build_dir = os.path.join(args.build_dir, top)
+    bench = build_testbench(
+        args.filename,
+        top,
+        build_dir,
+        directions,
+        widths,
+        args.outstanding,
+        args.verbose,
+    )
+
+    if args.stimulus is not None:
+        results = run(
+            bench, load_stimulus(args.stimulus), build_dir, args.rsp_ready, args.seed
+        )
+    else:
+        if args.functions is None:
+            functions = range(min(8, 1 << widths["cmd_payload_function_id"]))
+        else:
+            functions = [int(f, 0) for f in args.functions.split(",")]
+        rng = random.Random(args.seed)
+        results = []
+        # One full-rate stream per function_id (II/throughput of back-to-back ops).
+        for function_id in functions:
+            stimulus = random_stimulus(function_id, args.ops, widths, rng)
+            results += run(bench, stimulus, build_dir, args.rsp_ready, args.seed)
+
+    stats = statistics(results)
+    print_statistics(top, stats)
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"top": top, "functions": stats}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
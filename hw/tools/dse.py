@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import sys
+import csv
+import json
+import signal
+import hashlib
+import argparse
+import itertools
+import threading
+import subprocess
+
+import reports
+
+# Design-Space Exploration -------------------------------------------------------------------------
+
+# Sweeps a grid of CPU parameters with make.py, one configuration at a time:
+# - --board: builds the configuration, its utilisation and Fmax are read from the build's report
+#   (tools/reports.py, one database per configuration and make.py arguments, in
+#   build/dse/<configuration>[-<arguments hash>]/: a build restored from the bitstream cache, not
+#   recorded again, reuses the record of the previous build with the same arguments).
+# - --benchmark: runs the binary on the simulated SoC (make.py --sim) and takes the first match
+#   of --metric in its UART output (e.g. a cycle count) as the configuration's performance.
+# Netlists (and bitstreams) come from the usual caches: configurations already built, by a sweep
+# or not, are not generated again. The results are printed as a table, configurations on the
+# Pareto front (performance, LUTs, Fmax) marked with *, and written to build/dse/results.csv.
+#
+# Parameters are the --uarch knobs (fetch_l1_ways, lsu_l1_ways, lsu_bypass, relaxed_branch,
+# bypass_from, btb, ras, gshare) and l2_bytes/l2_ways; other make.py arguments (--cxu,
+# --toolchain, --sbt-server...) are passed through.
+
+MAKE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "make.py"
+)
+
+# Parameters with their own make.py option, others are --uarch knobs.
+MAKE_OPTIONS = {
+    "l2_bytes": "--l2-bytes",
+    "l2_ways": "--l2-ways",
+}
+
+# Grid ---------------------------------------------------------------------------------------------
+
+
+def parse_grid(params, grid_file=None):
+    grid = {}
+    if grid_file is not None:
+        with open(grid_file) as f:
+            grid.update(json.load(f))
+    for param in params:
+        name, sep, values = param.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid parameter {param!r} (name=value,value,...).")
+        grid[name.strip().replace("-", "_")] = values.split(",")
+    return grid
+
+
+def configurations(grid):
+    names = sorted(grid)
+    for values in itertools.product(*[grid[name] for name in names]):
+        yield {name: int(str(value), 0) for name, value in zip(names, values)}
+
+
+def config_name(config):
+    return "_".join(f"{name}{value}" for name, value in config.items()) or "default"
+
+
+def run_directory(output_dir, name, extra_args):
+    # Runs with other make.py arguments (--cxu...) don't share their reports.
+    if extra_args:
+        digest = hashlib.sha256("\0".join(extra_args).encode("utf-8")).hexdigest()
+        name += "-" + digest[:8]
+    return os.path.join(output_dir, name)
+
+
+def make_args(config):
+    args = []
+    uarch = []
+    for name, value in config.items():
+        if name in MAKE_OPTIONS:
+            args += [MAKE_OPTIONS[name], str(value)]
+        else:
+            uarch.append(f"{name}={value}")
+    if uarch:
+        args += ["--uarch", ",".join(uarch)]
+    return args
+
+
+# Runs ---------------------------------------------------------------------------------------------
+
+
+def build(config, board, directory, extra_args):
+    db = os.path.join(directory, "reports.jsonl")
+    command = [sys.executable, MAKE, "--board", board, "--build", "--report-db", db]
+    command += make_args(config) + extra_args
+    recorded = len(reports.load(db))
+    with open(os.path.join(directory, "build.log"), "w") as log:
+        if subprocess.call(command, stdout=log, stderr=subprocess.STDOUT):
+            raise RuntimeError(f"build failed, see {log.name}.")
+    records = reports.load(db)
+    if len(records) > recorded:
+        return records[-1]
+    # Not recorded: bitstream restored from the cache.
+    if not records:
+        raise RuntimeError(
+            f"bitstream restored from the cache without a report, rebuild it with --force "
+            f"(see {log.name})."
+        )
+    print("    bitstream restored from the cache, report of its previous build.")
+    return records[-1]
+
+
+def simulate(config, benchmark, metric, timeout, directory, extra_args):
+    # The simulation runs until killed: stop it on the first match (or the timeout). make.py and
+    # the simulator it starts are in their own process group, killed together.
+    command = [sys.executable, MAKE, "--sim", "--sim-ram-init", benchmark]
+    command += make_args(config) + extra_args
+    with open(os.path.join(directory, "sim.log"), "w") as log:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            start_new_session=True,
+        )
+
+        def kill():
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        value = None
+        try:
+            for line in process.stdout:
+                log.write(line)
+                match = re.search(metric, line)
+                if match:
+                    value = float(match.group(1))
+                    break
+        finally:
+            timer.cancel()
+            kill()
+            process.wait()
+    if value is None:
+        raise RuntimeError(f"no {metric!r} in the simulation output, see {log.name}.")
+    return value
+
+
+# Pareto front -------------------------------------------------------------------------------------
+
+
+def pareto(results, maximize):
+    # Objectives: performance (metric), LUTs (lower is better) and Fmax (higher is better), those
+    # known for every result.
+    objectives = []
+    for key, sign in [("metric", 1 if maximize else -1), ("lut", -1), ("fmax", 1)]:
+        if all(r.get(key) is not None for r in results):
+            objectives.append((key, sign))
+
+    def dominates(a, b):
+        scores = [(sign * a[key], sign * b[key]) for key, sign in objectives]
+        return all(x >= y for x, y in scores) and any(x > y for x, y in scores)
+
+    for r in results:
+        r["pareto"] = not any(dominates(other, r) for other in results)
+
+
+def _format(value, fmt="{:.1f}"):
+    return "-" if value is None else fmt.format(value)
+
+
+def print_table(results):
+    print(f"  {'Configuration':<48} {'Metric':>12} {'LUT':>8} {'FF':>8} {'Fmax':>8}")
+    for r in results:
+        print(
+            f"{'*' if r['pareto'] else ' '} {r['name']:<48} {_format(r['metric']):>12} "
+            f"{_format(r['lut'], '{:.0f}'):>8} {_format(r['ff'], '{:.0f}'):>8} "
+            f"{_format(r['fmax']):>8}" + (f"  ({r['error']})" if r["error"] else "")
+        )
+
+
+def write_csv(filename, results, names):
+    fields = ["name", *names, "metric", "lut", "ff", "fmax", "pareto", "error"]
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        writer.writeheader()
+        for r in results:
+            writer.writerow({**r["config"], **r})
+
+
+# Main ---------------------------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="VexiiRiscv design-space exploration (other arguments go to make.py)."
+    )
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help="Swept parameter and its values: name=value,value,... (repeatable).",
+    )
+    parser.add_argument(
+        "--grid",
+        default=None,
+        help="JSON file with the swept parameters: {name: [values]}.",
+    )
+    parser.add_argument(
+        "--board", default=None, help="Build each configuration for this board."
+    )
+    parser.add_argument(
+        "--benchmark",
+        default=None,
+        help="Binary run on the simulated SoC of each configuration.",
+    )
+    parser.add_argument(
+        "--metric",
+        default=r"cycles\s*[:=]\s*(\d+)",
+        help="Regex of the benchmark's result in its output (first group).",
+    )
+    parser.add_argument(
+        "--maximize",
+        action="store_true",
+        help="Higher metric is better (default: lower, e.g. cycles).",
+    )
+    parser.add_argument(
+        "--timeout",
+        default=3600,
+        type=float,
+        help="Simulation timeout (s).",
+    )
+    parser.add_argument(
+        "--output-dir", default=os.path.join("build", "dse"), help="Output directory."
+    )
+    args, extra_args = parser.parse_known_args()
+    if args.board is None and args.benchmark is None:
+        parser.error("nothing to evaluate: give --board and/or --benchmark.")
+
+    try:
+        grid = parse_grid(args.param, args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    results = []
+    for config in configurations(grid):
+        name = config_name(config)
+        directory = run_directory(args.output_dir, name, extra_args)
+        os.makedirs(directory, exist_ok=True)
+        print(f"[{len(results) + 1}] {name}")
+        result = dict(name=name, config=config, error="")
+        result.update(metric=None, lut=None, ff=None, fmax=None)
+        try:
+            if args.board is not None:
+                record = build(config, args.board, directory, extra_args)
+                resources = record["resources"]
+                result["lut"] = resources.get("lut", {}).get("used")
+                result["ff"] = resources.get("ff", {}).get("used")
+                result["fmax"] = min(record["fmax_mhz"].values(), default=None)
+            if args.benchmark is not None:
+                result["metric"] = simulate(
+                    config,
+                    args.benchmark,
+                    args.metric,
+                    args.timeout,
+                    directory,
+                    extra_args,
+                )
+        except RuntimeError as e:
+            print(f"    {e}")
+            result["error"] = str(e)
+        results.append(result)
+
+    done = [r for r in results if not r["error"]]
+    pareto(done, args.maximize)
+    for r in results:
+        r.setdefault("pareto", False)
+    key = -1 if args.maximize else 1
+    results.sort(
+        key=lambda r: (r["error"] != "", key * (r["metric"] or 0), r["lut"] or 0)
+    )
+    print_table(results)
+    filename = os.path.join(args.output_dir, "results.csv")
+    write_csv(filename, results, sorted(grid))
+    print(f"Results written to {filename}.")
+    if not done:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import time
+import shutil
+import hashlib
+
+# BitstreamCache -----------------------------------------------------------------------------------
+
+# Skips the toolchain (synthesis/P&R) when its inputs didn't change since a previous build.
+#
+# The toolchain's run_script is wrapped: when it is called, every toolchain input has been written
+# to the gateware directory (top-level Verilog, memory init files, constraints, project and build
+# scripts, which also carry the toolchain options) and platform.sources lists the external
+# sources (CPU netlist, RAMs, CXUs/CFU). The fingerprint is computed over these (LiteX's
+# generation dates stripped) and the resulting bitstreams are stored under it; a later build with
+# the same fingerprint restores them instead of running the toolchain.
+
+_DATE = re.compile(rb"\d{4}-\d\d-\d\d \d\d:\d\d(:\d\d)?")
+
+
+def _file_digest(filename):
+    with open(filename, "rb") as f:
+        data = _DATE.sub(b"", f.read())
+    return hashlib.sha256(data).hexdigest()
+
+
+class BitstreamCache:
+    def __init__(self, directory, force=False, keep=4):
+        self.directory = os.path.abspath(
+            directory
+        )  # run_script runs in the gateware dir.
+        self.force = force
+        self.keep = keep
+        self.fingerprint = None
+        self.restored = False
+
+    def install(self, platform):
+        toolchain = platform.toolchain
+        run_script = toolchain.run_script
+        start = time.time()
+
+        def cached_run_script(script):
+            gateware_dir = os.getcwd()
+            bitstreams = self.bitstreams(platform, toolchain._build_name)
+            self.fingerprint = self.compute(platform, gateware_dir, start, bitstreams)
+            entry = os.path.join(self.directory, self.fingerprint)
+            if (
+                not self.force
+                and bitstreams
+                and all(os.path.exists(os.path.join(entry, b)) for b in bitstreams)
+            ):
+                print(
+                    f"Bitstream up to date ({self.fingerprint[:16]}), skipping toolchain."
+                )
+                for b in bitstreams:
+                    shutil.copyfile(
+                        os.path.join(entry, b), os.path.join(gateware_dir, b)
+                    )
+                self.restored = True
+                return
+            run_script(script)
+            self.store(gateware_dir, bitstreams)
+
+        toolchain.run_script = cached_run_script
+
+    @staticmethod
+    def bitstreams(platform, build_name):
+        bitstreams = []
+        for mode in ["sram", "flash"]:
+            try:
+                ext = platform.get_bitstream_extension(mode)
+            except Exception:
+                continue
+            if ext and (build_name + ext) not in bitstreams:
+                bitstreams.append(build_name + ext)
+        return bitstreams
+
+    @staticmethod
+    def compute(platform, gateware_dir, start, exclude=()):
+        sha256_hash = hashlib.sha256()
+        sha256_hash.update(type(platform.toolchain).__name__.encode("utf-8"))
+        # Toolchain inputs written by this build (previous outputs are older).
+        for name in sorted(os.listdir(gateware_dir)):
+            filename = os.path.join(gateware_dir, name)
+            if name in exclude or not os.path.isfile(filename):
+                continue
+            if os.path.getmtime(filename) >= start:
+                sha256_hash.update(f"{name}:{_file_digest(filename)}\n".encode("utf-8"))
+        # External sources.
+        for filename, language, library, *copy in sorted(platform.sources):
+            digest = _file_digest(filename) if os.path.isfile(filename) else "none"
+            sha256_hash.update(f"{filename}:{library}:{digest}\n".encode("utf-8"))
+        return sha256_hash.hexdigest()
+
+    def store(self, gateware_dir, bitstreams):
+        bitstreams = [
+            b for b in bitstreams if os.path.exists(os.path.join(gateware_dir, b))
+        ]
+        if not bitstreams:
+            return
+        entry = os.path.join(self.directory, self.fingerprint)
+        staging = entry + f".{os.getpid()}"
+        os.makedirs(staging, exist_ok=True)
+        for b in bitstreams:
+            shutil.copyfile(os.path.join(gateware_dir, b), os.path.join(staging, b))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(staging, entry)
+        # Only keep the most recent bitstreams.
+        entries = sorted(
+            (os.path.join(self.directory, e) for e in os.listdir(self.directory)),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for e in entries[self.keep :]:
+            shutil.rmtree(e, ignore_errors=True)
@@ -0,0 +1,170 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import shutil
+import subprocess
+
+from tools.incremental import _file_digest
+
+# ClusterCheckpoint --------------------------------------------------------------------------------
+
+# Synthesizes the VexiiRiscv cluster out of context once and links it into the top-level runs.
+#
+# The toolchain's run_script is wrapped (inside the BitstreamCache, whose fingerprint is left
+# unchanged): the cluster sources (netlist and RAMs) are synthesized alone into a checkpoint,
+# stored in the netlist cache under (sources, FPGA family/device, toolchain and its options), and
+# the top-level script is rewritten to read a black box stub of the cluster instead, then link the
+# checkpoint in:
+# - Yosys/nextpnr (ecp5, ice40): JSON netlist, merged into the top-level JSON before nextpnr.
+# - Vivado: OOC DCP, read into the synthesized top-level design's black box cell.
+# Other toolchains synthesize the cluster with the rest of the design, as without the option.
+
+_YOSYS_FAMILIES = ["ecp5", "ice40"]
+
+
+def _flow(toolchain):
+    from litex.build.xilinx.vivado import XilinxVivadoToolchain
+    from litex.build.yosys_nextpnr_toolchain import YosysNextPNRToolchain
+
+    if isinstance(toolchain, XilinxVivadoToolchain):
+        return "vivado" if toolchain._synth_mode == "vivado" else None
+    if isinstance(toolchain, YosysNextPNRToolchain):
+        return "yosys" if toolchain.family in _YOSYS_FAMILIES else None
+    return None
+
+
+class ClusterCheckpoint:
+    def __init__(self, cache):
+        self.cache = cache  # cpu.cache.NetlistCache.
+
+    def install(self, platform, cpu):
+        toolchain = platform.toolchain
+        run_script = toolchain.run_script
+
+        def ooc_run_script(script):
+            flow = _flow(toolchain)
+            if flow is None:
+                print(
+                    f"No out-of-context CPU synthesis for {type(toolchain).__name__}."
+                )
+            else:
+                entry = self.checkpoint(flow, platform, cpu)
+                build_name = toolchain._build_name
+                if flow == "yosys":
+                    self.link_yosys(build_name + ".ys", cpu, entry)
+                else:
+                    self.link_vivado(build_name + ".tcl", cpu, entry)
+            run_script(script)
+
+        toolchain.run_script = ooc_run_script
+
+    def checkpoint(self, flow, platform, cpu):
+        toolchain = platform.toolchain
+        tool = "yosys" if flow == "yosys" else "vivado"
+        family = toolchain.family if flow == "yosys" else platform.device
+        options = toolchain._synth_opts if flow == "yosys" else ""
+        key = self.cache.key(
+            "ClusterCheckpoint",
+            flow,
+            family,
+            options,
+            os.path.realpath(
+                shutil.which(tool) or tool
+            ),  # Versioned install directories.
+            cpu.netlist_name,
+            *[_file_digest(source) for source in cpu.cluster_sources],
+        )
+        entry = self.cache.lookup(key)
+        if entry is not None:
+            print(f"CPU checkpoint up to date ({key[:16]}), skipping its synthesis.")
+            return entry
+        staging = self.cache.staging()
+        try:
+            if flow == "yosys":
+                script = "cluster.ys"
+                self.write(staging, script, self.yosys_script(cpu, family, options))
+                command = ["yosys", "-q", "-l", "cluster.rpt", script]
+            else:
+                script = "cluster.tcl"
+                self.write(staging, script, self.vivado_script(cpu, family))
+                command = ["vivado", "-mode", "batch", "-source", script]
+            subprocess.check_call(command, cwd=staging)
+        except:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return self.cache.store(key, staging)
+
+    @staticmethod
+    def write(directory, filename, lines):
+        with open(os.path.join(directory, filename), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    # Yosys / nextpnr.
+
+    @staticmethod
+    def yosys_script(cpu, family, options):
+        return [
+            *[f"read_verilog {source}" for source in cpu.cluster_sources],
+            f"synth_{family} {options} -top {cpu.netlist_name}",
+            "write_json cluster.json",
+            f"blackbox {cpu.netlist_name}",
+            "write_verilog -noattr stub.v",
+        ]
+
+    @staticmethod
+    def link_yosys(filename, cpu, entry):
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        # Stub read first, outside of the deferred sources.
+        linked = [f"read_verilog -lib {os.path.join(entry, 'stub.v')}"]
+        for line in lines:
+            if any(line.endswith(" " + source) for source in cpu.cluster_sources):
+                continue
+            if line.startswith("write_"):
+                # Top-level synthesized: replace the black box by the cluster's netlist.
+                linked += [
+                    f"delete {cpu.netlist_name}",
+                    f"read_json {os.path.join(entry, 'cluster.json')}",
+                    "hierarchy -check",
+                    "flatten",
+                ]
+            linked.append(line)
+        with open(filename, "w") as f:
+            f.write("\n".join(linked) + "\n")
+
+    # Vivado.
+
+    @staticmethod
+    def vivado_script(cpu, device):
+        return [
+            f"create_project -in_memory -part {device}",
+            *[f"read_verilog {{{source}}}" for source in cpu.cluster_sources],
+            f"synth_design -mode out_of_context -top {cpu.netlist_name} -part {device}",
+            "write_checkpoint -force cluster.dcp",
+            "write_verilog -force -mode synth_stub stub.v",
+        ]
+
+    @staticmethod
+    def link_vivado(filename, cpu, entry):
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        stub = os.path.join(entry, "stub.v")
+        dcp = os.path.join(entry, "cluster.dcp")
+        linked = []
+        for line in lines:
+            if any(
+                line == f"read_verilog {{{source}}}" for source in cpu.cluster_sources
+            ):
+                continue
+            if line == "# Add EDIFs":
+                linked.append(f"read_verilog {{{stub}}}")
+            linked.append(line)
+            if line.startswith("synth_design "):
+                cell = f"[get_cells -hierarchical -filter {{REF_NAME == {cpu.netlist_name}}}]"
+                linked.append(f"read_checkpoint -cell {cell} {{{dcp}}}")
+        with open(filename, "w") as f:
+            f.write("\n".join(linked) + "\n")
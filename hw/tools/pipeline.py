@@ -0,0 +1,120 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import time
+import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tools import trace
+
+# Build Pipeline -----------------------------------------------------------------------------------
+
+# Runs the steps of a board build as a dependency graph, independent steps at the same time.
+#
+# Steps are submitted as the build goes (the SoC's finalize submits the netlist generation, the CSR
+# map export the DTS...) with the names of the steps they depend on; a step starts once its
+# dependencies are done and is skipped if one of them failed. The main thread keeps the steps that
+# can't leave it (elaboration, Builder.build) and waits for the steps it needs with wait(). Steps
+# are mostly sub-processes (sbt, dtc, compilers, toolchains), threads are enough to overlap them.
+# With threads=0, steps run in submit(), in order (sequential build).
+#
+# Steps share the process' working directory, that LiteX's toolchains change (os.chdir to the
+# gateware directory) for the gateware build: steps using relative paths must be done before it
+# (before(soc, "build", ...)).
+
+
+class PipelineError(Exception):
+    def __init__(self, failed, skipped):
+        self.failed = failed
+        self.skipped = skipped
+        message = ", ".join(f"{name} ({type(e).__name__}: {e})" for name, e in failed)
+        if skipped:
+            message += f"; skipped: {', '.join(skipped)}"
+        super().__init__(f"build step(s) failed: {message}")
+
+
+class Pipeline:
+    def __init__(self, threads=4):
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(threads) if threads else None
+        self.steps = {}
+        self.durations = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.joined = False
+
+    def submit(self, name, func, deps=()):
+        assert name not in self.steps, f"Step {name} already submitted."
+        deps = [self.steps[dep] for dep in deps]
+        if self.executor is None:
+            self.steps[name] = None
+            self._run(name, func, [])
+        else:
+            self.steps[name] = self.executor.submit(self._run, name, func, deps)
+
+    def _run(self, name, func, deps):
+        # Dependencies were submitted first, so they are running (or done) when a step waits.
+        for dep in deps:
+            if not dep.result():
+                return False  # Skipped.
+        start = time.time()
+        try:
+            with trace.phase(name):
+                func()
+        except BaseException as e:
+            traceback.print_exc()
+            with self.lock:
+                self.errors[name] = e
+            if self.executor is None:
+                raise
+            return False
+        finally:
+            with self.lock:
+                self.durations[name] = time.time() - start
+        return True
+
+    def before(self, obj, method, *names):
+        # Every call of obj.method first waits for the (submitted) steps names.
+        func = getattr(obj, method)
+
+        def waiting(*args, **kwargs):
+            self.wait(*[name for name in names if name in self.steps])
+            return func(*args, **kwargs)
+
+        setattr(obj, method, waiting)
+
+    def after(self, obj, method, name, step, deps=()):
+        # Submit step once obj.method has returned.
+        func = getattr(obj, method)
+
+        def submitting(*args, **kwargs):
+            result = func(*args, **kwargs)
+            self.submit(name, step, deps)
+            return result
+
+        setattr(obj, method, submitting)
+
+    def wait(self, *names):
+        # Wait for steps, raising on failure (the main thread can't go on without them).
+        for name in names:
+            step = self.steps[name]
+            if step is not None and not step.result():
+                self.join()
+
+    def join(self):
+        # Wait for every step, then report: raises PipelineError if any failed.
+        if self.joined:
+            return
+        self.joined = True
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        for name, duration in self.durations.items():
+            status = "failed" if name in self.errors else "ok"
+            print(f"Step {name:<24} {status:<8} {duration:8.1f}s")
+        if self.errors:
+            skipped = [name for name in self.steps if name not in self.durations]
+            raise PipelineError(list(self.errors.items()), skipped)
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import re
+import json
+import time
+import fcntl
+import sqlite3
+import argparse
+
+# Build Reports ------------------------------------------------------------------------------------
+
+# Utilisation and timing of each build, parsed from the toolchain's reports into one record:
+#
+#   {"id", "time", "board", "toolchain", "cpu_config" (netlist name, hashed from the CPU
+#    configuration), "vexii_args", "cxus", "resources": {"lut", "ff", "bram", "dsp" and the
+#    toolchain's own names: {"used", "available"}}, "worst_slack_ns", "fmax_mhz": {clock: MHz}}
+#
+# Records are appended to a database: JSON Lines, or SQLite for .db/.sqlite files (one row per
+# record, the record as JSON). The command line lists the records and compares two builds.
+#
+# Reports: nextpnr --report JSON (Yosys/nextpnr), Vivado utilization/timing reports, Quartus fit
+# and STA reports, Efinity place/timing reports.
+
+# Vendor resource names -> lut/ff/bram/dsp.
+_RESOURCES = {
+    "lut": [
+        "TRELLIS_COMB",
+        "ICESTORM_LC",
+        "LUT4",
+        "OXIDE_COMB",
+        "Slice LUTs",
+        "CLB LUTs",
+        "Total logic elements",
+        "Logic utilization (in ALMs)",
+        "EFX_LUT4",
+    ],
+    "ff": [
+        "TRELLIS_FF",
+        "DFF",
+        "OXIDE_FF",
+        "Slice Registers",
+        "CLB Registers",
+        "Total registers",
+        "EFX_FF",
+    ],
+    "bram": [
+        "DP16KD",
+        "SB_RAM40_4K",
+        "BSRAM",
+        "OXIDE_EBR",
+        "Block RAM Tile",
+        "M9Ks",
+        "Total RAM Blocks",
+        "EFX_RAM_5K",
+        "EFX_RAM10",
+    ],
+    "dsp": [
+        "MULT18X18D",
+        "SB_MAC16",
+        "MULT18X18",
+        "MULT18_CORE",
+        "DSPs",
+        "Embedded Multiplier 9-bit elements",
+        "Total DSP Blocks",
+        "EFX_MULT",
+        "EFX_DSP48",
+    ],
+}
+
+
+def _number(value):
+    return float(value.replace(",", ""))
+
+
+def _resource(resources, name, used, available=None):
+    resources[name] = {"used": used, "available": available}
+    for kind, names in _RESOURCES.items():
+        if name in names and kind not in resources:
+            resources[kind] = resources[name]
+
+
+def _read(filename):
+    if not os.path.exists(filename):
+        return None
+    with open(filename, errors="replace") as f:
+        return f.read()
+
+
+# Parsers: (resources, worst slack (ns) or None, {clock: fmax (MHz)}) from a gateware directory.
+
+
+def parse_nextpnr(gateware_dir, build_name):
+    report = _read(os.path.join(gateware_dir, f"{build_name}_report.json"))
+    if report is None:
+        return None
+    report = json.loads(report)
+    resources = {}
+    for name, usage in report.get("utilization", {}).items():
+        _resource(resources, name, usage["used"], usage["available"])
+    fmax = {}
+    slack = None
+    for clock, timing in report.get("fmax", {}).items():
+        fmax[clock] = timing["achieved"]
+        clock_slack = 1e3 / timing["constraint"] - 1e3 / timing["achieved"]
+        slack = clock_slack if slack is None else min(slack, clock_slack)
+    return resources, slack, fmax
+
+
+def parse_vivado(gateware_dir, build_name):
+    utilization = _read(
+        os.path.join(gateware_dir, f"{build_name}_utilization_place.rpt")
+    )
+    timing = _read(os.path.join(gateware_dir, f"{build_name}_timing.rpt"))
+    if utilization is None or timing is None:
+        return None
+    resources = {}
+    # | Site Type | Used | Fixed | (Prohibited |) Available | Util% |
+    for line in utilization.splitlines():
+        cells = [c.strip() for c in line.strip().strip("|").split("|")]
+        numbers = len(cells) >= 5 and all(
+            re.fullmatch(r"[\d.]+", c) for c in [cells[1], cells[-2]]
+        )
+        if numbers and cells[0] and cells[0] not in resources:
+            _resource(resources, cells[0], _number(cells[1]), _number(cells[-2]))
+    # Clock Summary (periods) and Intra Clock Table (slack per clock).
+    periods = {}
+    slacks = {}
+    section = None
+    for line in timing.splitlines():
+        if line.startswith("| Clock Summary"):
+            section = periods
+        elif line.startswith("| Intra Clock Table"):
+            section = slacks
+        elif line.startswith("| ") and section is not None and "Table" in line:
+            section = None
+        fields = line.split()
+        if (
+            section is periods
+            and len(fields) >= 4
+            and fields[-2].replace(".", "").isdigit()
+        ):
+            periods[fields[0]] = _number(fields[-2])
+        elif (
+            section is slacks
+            and len(fields) >= 2
+            and re.fullmatch(r"-?[\d.]+", fields[1])
+        ):
+            slacks[fields[0]] = _number(fields[1])
+    fmax = {
+        clock: 1e3 / (periods[clock] - wns)
+        for clock, wns in slacks.items()
+        if clock in periods
+    }
+    return resources, min(slacks.values(), default=None), fmax
+
+
+def parse_quartus(gateware_dir, build_name):
+    fit = _read(os.path.join(gateware_dir, f"{build_name}.fit.summary"))
+    sta = _read(os.path.join(gateware_dir, f"{build_name}.sta.rpt"))
+    sta_summary = _read(os.path.join(gateware_dir, f"{build_name}.sta.summary"))
+    if fit is None or sta is None or sta_summary is None:
+        return None
+    resources = {}
+    # Name : used / available ( N % ), or Total ... : used.
+    for match in re.finditer(r"^(.+?) : ([\d,]+)(?: / ([\d,]+))?", fit, re.M):
+        name, used, available = match.groups()
+        name = name.strip()
+        if available is not None or name.startswith("Total"):
+            _resource(resources, name, _number(used), available and _number(available))
+    # ; Fmax ; Restricted Fmax ; Clock Name ; Note ;
+    fmax = {}
+    for match in re.finditer(r"^; ([\d.]+) MHz ; ([\d.]+) MHz +; (\S+) +;", sta, re.M):
+        fmax.setdefault(match.group(3), _number(match.group(2)))
+    # Type : ... Setup 'clock' / Slack : N
+    slacks = re.findall(r"Setup '.*?'\s*\nSlack\s*:\s*(-?[\d.]+)", sta_summary)
+    slacks = [_number(s) for s in slacks]
+    return resources, min(slacks, default=None), fmax
+
+
+def parse_efinity(gateware_dir, build_name):
+    place = _read(os.path.join(gateware_dir, "outflow", f"{build_name}.place.rpt"))
+    timing = _read(os.path.join(gateware_dir, "outflow", f"{build_name}.timing.rpt"))
+    if place is None or timing is None:
+        return None
+    resources = {}
+    for match in re.finditer(
+        r"^\s*(EFX_\w+|[A-Za-z ]+?)\s*:\s*(\d+)\s*/\s*(\d+)", place, re.M
+    ):
+        _resource(
+            resources, match.group(1), _number(match.group(2)), _number(match.group(3))
+        )
+    # Maximum Possible Analyzed Clocks Frequency: clock, period (ns), frequency (MHz).
+    fmax = {}
+    section = timing.split("Maximum Possible Analyzed Clocks Frequency")[-1]
+    for match in re.finditer(r"^\s*(\S+)\s+([\d.]+)\s+([\d.]+)", section, re.M):
+        fmax.setdefault(match.group(1), _number(match.group(3)))
+    slacks = [_number(s) for s in re.findall(r"Worst Slack[^-\d]*(-?[\d.]+)", timing)]
+    return resources, min(slacks, default=None), fmax
+
+
+_PARSERS = [parse_nextpnr, parse_vivado, parse_quartus, parse_efinity]
+
+
+def enable(toolchain, build_name):
+    # Reports not written by default: nextpnr's JSON report.
+    from litex.build.yosys_nextpnr_toolchain import YosysNextPNRToolchain
+
+    from tools.toolchain import add_pnr_options
+
+    if isinstance(toolchain, YosysNextPNRToolchain):
+        add_pnr_options(toolchain, f"--report {build_name}_report.json")
+
+
+def build_record(gateware_dir, build_name, **info):
+    for parser in _PARSERS:
+        parsed = parser(gateware_dir, build_name)
+        if parsed is not None:
+            resources, slack, fmax = parsed
+            return {
+                "time": time.time(),
+                **info,
+                "resources": resources,
+                "worst_slack_ns": slack,
+                "fmax_mhz": fmax,
+            }
+    return None
+
+
+# Database -----------------------------------------------------------------------------------------
+
+
+def _sqlite(filename):
+    return os.path.splitext(filename)[1] in [".db", ".sqlite"]
+
+
+def append(filename, record):
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    if _sqlite(filename):
+        with sqlite3.connect(filename) as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS builds (id INTEGER PRIMARY KEY, board TEXT, "
+                "cpu_config TEXT, time REAL, record TEXT)"
+            )
+            cursor = db.execute(
+                "INSERT INTO builds (board, cpu_config, time, record) VALUES (?, ?, ?, ?)",
+                (
+                    record["board"],
+                    record["cpu_config"],
+                    record["time"],
+                    json.dumps(record),
+                ),
+            )
+            record["id"] = cursor.lastrowid
+    else:
+        # Ids assigned under a lock: --jobs builds append to the same file.
+        with open(filename + ".lock", "w") as lock:
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+            try:
+                record["id"] = len(load(filename)) + 1
+                with open(filename, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            finally:
+                fcntl.lockf(lock, fcntl.LOCK_UN)
+    return record
+
+
+def load(filename):
+    if not os.path.exists(filename):
+        return []
+    if _sqlite(filename):
+        with sqlite3.connect(filename) as db:
+            rows = db.execute("SELECT id, record FROM builds ORDER BY id").fetchall()
+        return [{**json.loads(record), "id": id} for id, record in rows]
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Command line -------------------------------------------------------------------------------------
+
+
+def _select(records, build):
+    # Build id, or negative index (-1: last record).
+    index = int(build)
+    if index < 0:
+        return records[index]
+    for record in records:
+        if record["id"] == index:
+            return record
+    raise SystemExit(f"No build {build}.")
+
+
+def _format(value, fmt="{:.1f}"):
+    return "-" if value is None else fmt.format(value)
+
+
+def list_records(records):
+    print(
+        f"{'Id':>4}  {'Date':<16} {'Board':<24} {'CPU config':<18} {'LUT':>8} {'FF':>8} {'Fmax':>8}  CXUs"
+    )
+    for r in records:
+        date = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["time"]))
+        lut = r["resources"].get("lut", {}).get("used")
+        ff = r["resources"].get("ff", {}).get("used")
+        fmax = min(r["fmax_mhz"].values(), default=None)
+        cxus = ", ".join(os.path.basename(c) for c in r["cxus"]) or "-"
+        print(
+            f"{r['id']:>4}  {date:<16} {r['board']:<24} {r['cpu_config'][-16:]:<18} "
+            f"{_format(lut, '{:.0f}'):>8} {_format(ff, '{:.0f}'):>8} {_format(fmax):>8}  {cxus}"
+        )
+
+
+def compare(a, b):
+    print(f"{'':<36} {'#' + str(a['id']):>12} {'#' + str(b['id']):>12} {'Delta':>12}")
+    for key in ["board", "cpu_config", "toolchain"]:
+        print(f"{key:<36} {str(a[key])[-12:]:>12} {str(b[key])[-12:]:>12}")
+    for name in ["cxus", "vexii_args"]:
+        if a[name] != b[name]:
+            print(f"{name:<36} changed: {a[name]} -> {b[name]}")
+
+    def row(name, x, y):
+        delta = None if x is None or y is None else y - x
+        delta = _format(delta, "{:+.1f}")
+        print(f"{name:<36} {_format(x):>12} {_format(y):>12} {delta:>12}")
+
+    print("Resources")
+    names = [n for n in a["resources"] if n in b["resources"]]
+    for name in sorted(names, key=lambda n: (n not in _RESOURCES, n)):
+        row("  " + name, a["resources"][name]["used"], b["resources"][name]["used"])
+    print("Timing")
+    row("  worst slack (ns)", a["worst_slack_ns"], b["worst_slack_ns"])
+    for clock in sorted(set(a["fmax_mhz"]) | set(b["fmax_mhz"])):
+        row(f"  fmax {clock} (MHz)", a["fmax_mhz"].get(clock), b["fmax_mhz"].get(clock))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build utilisation/timing records.")
+    parser.add_argument(
+        "--db",
+        default=os.path.join("build", "reports.jsonl"),
+        help="Report database (JSON Lines, or SQLite for .db/.sqlite).",
+    )
+    parser.add_argument(
+        "--board", default=None, help="Only consider this board's builds."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List the builds.")
+    compare_parser = commands.add_parser("compare", help="Compare two builds.")
+    compare_parser.add_argument(
+        "a", help="Build id, or negative index (-2: second to last)."
+    )
+    compare_parser.add_argument("b", help="Build id, or negative index (-1: last).")
+    args = parser.parse_args()
+
+    records = load(args.db)
+    if args.board is not None:
+        records = [r for r in records if r["board"] == args.board]
+    if args.command == "list":
+        list_records(records)
+    else:
+        compare(_select(records, args.a), _select(records, args.b))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+# Toolchain Parallelism ----------------------------------------------------------------------------
+
+# --threads translated to each toolchain's parallelism settings, returned as Builder.build
+# arguments or set on the toolchain (before its build):
+# - Vivado: general.maxThreads (synthesis, placement and routing; at most 32). -jobs only applies
+#   to project-mode runs (launch_runs), LiteX's non-project flow has no use for it.
+# - Yosys/nextpnr (ECP5, iCE40, Nexus, Gowin...): nextpnr --threads (placement/routing). Yosys,
+#   abc included, is run single-threaded by LiteX's scripts, without a thread setting.
+# - Quartus: NUM_PARALLEL_PROCESSORS.
+# Unsupported, run with their defaults: Efinity (LiteX calls efx_pnr with a fixed command line)
+# and the other toolchains.
+
+VIVADO_MAX_THREADS = 32
+
+# Helpers ------------------------------------------------------------------------------------------
+
+
+def add_pnr_options(toolchain, options):
+    # nextpnr options of a Yosys/nextpnr toolchain. Its finalize() (run by its build) sets the
+    # options up (and resets them on iCE40): added to nextpnr's once it has run.
+    finalize = toolchain.finalize
+
+    def finalize_with_options(*args, **kwargs):
+        result = finalize(*args, **kwargs)
+        toolchain._nextpnr._pnr_opts += f"{options} "
+        return result
+
+    toolchain.finalize = finalize_with_options
+
+
+# Parallelism --------------------------------------------------------------------------------------
+
+
+def parallelism(toolchain, threads):
+    from litex.build.altera.quartus import AlteraQuartusToolchain
+    from litex.build.xilinx.vivado import XilinxVivadoToolchain
+    from litex.build.yosys_nextpnr_toolchain import YosysNextPNRToolchain
+
+    if isinstance(toolchain, XilinxVivadoToolchain):
+        return dict(vivado_max_threads=min(threads, VIVADO_MAX_THREADS))
+    if isinstance(toolchain, YosysNextPNRToolchain):
+        add_pnr_options(toolchain, f"--threads {threads}")
+    elif isinstance(toolchain, AlteraQuartusToolchain):
+        toolchain.additional_qsf_commands.append(
+            f"set_global_assignment -name NUM_PARALLEL_PROCESSORS {threads}"
+        )
+    return {}
@@ -0,0 +1,143 @@
+#
+# This file is part of Linux-on-LiteX-VexRiscv
+#
+# Copyright (c) 2019-2024, Linux-on-LiteX-VexRiscv Developers
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import json
+import time
+import resource
+from contextlib import contextmanager
+
+# Build Trace --------------------------------------------------------------------------------------
+
+# Per-phase timing of a build, in Chrome trace-event format (chrome://tracing, Perfetto).
+#
+# Each phase is a complete ("X") event with its wall time (ts/dur) and, in args, the CPU time
+# (user+sys, this process and its waited-for sub-processes: sbt, compilers, toolchains) and the
+# peak RSS reached so far. Events are recorded in the current process; parallel workers return
+# theirs to the main process, which merges them. Boards are shown as threads.
+
+_events = []
+_boards = {}
+_board = None
+
+
+def set_board(name):
+    global _board
+    _board = name
+    if name not in _boards:
+        _boards[name] = len(_boards) + 1
+
+
+def _usage():
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = usage_self.ru_utime + usage_self.ru_stime
+    cpu += usage_children.ru_utime + usage_children.ru_stime
+    peak_rss = max(usage_self.ru_maxrss, usage_children.ru_maxrss)  # KiB.
+    return cpu, peak_rss
+
+
+@contextmanager
+def phase(name, **args):
+    start = time.time()
+    start_cpu, _ = _usage()
+    try:
+        yield args  # Callers may add to the event's args.
+    finally:
+        end = time.time()
+        end_cpu, peak_rss = _usage()
+        args.update(
+            board=_board,
+            cpu_s=round(end_cpu - start_cpu, 3),
+            peak_rss_mb=round(peak_rss / 1024, 1),
+        )
+        _events.append(
+            {
+                "name": name,
+                "cat": "build",
+                "ph": "X",
+                "ts": int(start * 1e6),
+                "dur": int((end - start) * 1e6),
+                "pid": os.getpid(),
+                "tid": _boards.get(_board, 0),
+                "args": args,
+            }
+        )
+
+
+def wrap(obj, method, name):
+    # Trace every call of obj.method (instance attribute, the class is left untouched).
+    func = getattr(obj, method)
+
+    def traced(*args, **kwargs):
+        with phase(name):
+            return func(*args, **kwargs)
+
+    setattr(obj, method, traced)
+
+
+def events():
+    # Recorded events, with the board (thread) names.
+    metadata = []
+    for board, tid in _boards.items():
+        metadata.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": board},
+            }
+        )
+    return metadata + _events
+
+
+def add_events(events):
+    # Events recorded by another process (parallel build worker).
+    _events.extend(events)
+
+
+def write(filename, events):
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, indent=1)
+
+
+# Profiler -----------------------------------------------------------------------------------------
+
+# Sampling profile (pyinstrument, HTML report) of a block, falling back to cProfile (.prof file,
+# for snakeviz/pstats) when pyinstrument isn't installed.
+
+
+@contextmanager
+def profile(filename, enabled=True):
+    if not enabled:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(filename + ".prof")
+            print(f"Profile written to {filename}.prof")
+        return
+    profiler = Profiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        with open(filename + ".html", "w") as f:
+            f.write(profiler.output_html())
+        print(f"Profile written to {filename}.html")
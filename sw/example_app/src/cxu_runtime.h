@@ -46,6 +46,28 @@ static inline uint32_t cxu_pack_selector_index(uint32_t selector,
     return (selector << CXU_INDEX_BITS) | (index & CXU_INDEX_MASK);
 }
 
+/*
+ * Hardware state contexts (CXUs built with state_contexts=N).
+ *
+ * The selector's low CXU_ID_BITS bits select the CXU, the bits above its context: switching
+ * context is a selector write. Through the state CSRs, word `index` of context `context` is at
+ * (context << bank_bits) | index, bank_bits being the CXU's state address width
+ * (log2 of its state depth, rounded up).
+ */
+#define CXU_ID_BITS 4
+
+static inline uint32_t cxu_selector(uint32_t cxu, uint32_t context)
+{
+    return (context << CXU_ID_BITS) | cxu;
+}
+
+static inline uint32_t cxu_context_index(uint32_t context,
+                                         uint32_t bank_bits,
+                                         uint32_t index)
+{
+    return (context << bank_bits) | index;
+}
+
 #define CXU_DATA_CSR 0xC00
 
 static inline uint32_t cxu_state_read_word(uint32_t selector,
@@ -97,5 +119,78 @@ static inline void cxu_state_write_block(uint32_t selector,
     }
 }
 
+/*
+ * Bulk state save/restore engine (CXUs built with state_dma=1).
+ *
+ * engine is the engine's CSR block, e.g. CSR_CXU0_STATE_DMA_BASE from generated/csr.h.
+ * The CXU must be idle during a transfer. Unless the SoC is built with coherent DMA, the
+ * buffer must not be cached (or be flushed/invalidated around the transfer).
+ */
+#define CXU_STATE_DMA_SAVE    0
+#define CXU_STATE_DMA_RESTORE 1
+
+#define CXU_STATE_DMA_BASE_REG      0x00
+#define CXU_STATE_DMA_INDEX_REG     0x04
+#define CXU_STATE_DMA_LENGTH_REG    0x08
+#define CXU_STATE_DMA_DIRECTION_REG 0x0c
+#define CXU_STATE_DMA_START_REG     0x10
+#define CXU_STATE_DMA_DONE_REG      0x14
+
+#define cxu_state_dma_reg(engine, reg) (*(volatile uint32_t *)((engine) + (reg)))
+
+static inline void cxu_state_dma_start(uintptr_t engine,
+                                       uint32_t direction,
+                                       uint32_t start_index,
+                                       void *buffer,
+                                       uint32_t words)
+{
+    cxu_state_dma_reg(engine, CXU_STATE_DMA_BASE_REG) = (uint32_t)(uintptr_t)buffer;
+    cxu_state_dma_reg(engine, CXU_STATE_DMA_INDEX_REG) = start_index;
+    cxu_state_dma_reg(engine, CXU_STATE_DMA_LENGTH_REG) = words;
+    cxu_state_dma_reg(engine, CXU_STATE_DMA_DIRECTION_REG) = direction;
+    cxu_state_dma_reg(engine, CXU_STATE_DMA_START_REG) = 1;
+}
+
+static inline int cxu_state_dma_done(uintptr_t engine)
+{
+    return cxu_state_dma_reg(engine, CXU_STATE_DMA_DONE_REG) & 1;
+}
+
+static inline void cxu_state_dma_wait(uintptr_t engine)
+{
+    while (!cxu_state_dma_done(engine));
+}
+
+static inline void cxu_state_dma_save(uintptr_t engine,
+                                      uint32_t start_index,
+                                      uint32_t *buffer,
+                                      uint32_t words)
+{
+    cxu_state_dma_start(engine, CXU_STATE_DMA_SAVE, start_index, buffer, words);
+    cxu_state_dma_wait(engine);
+}
+
+static inline void cxu_state_dma_restore(uintptr_t engine,
+                                         uint32_t start_index,
+                                         const uint32_t *buffer,
+                                         uint32_t words)
+{
+    cxu_state_dma_start(engine, CXU_STATE_DMA_RESTORE, start_index, (void *)buffer, words);
+    cxu_state_dma_wait(engine);
+}
+
+/*
+ * Streams (CXUs built with stream_depth=N).
+ *
+ * Function ids CXU_STREAM_PUSH/CXU_STREAM_POP are handled in front of the CXU: push writes a
+ * word to the CXU's sink FIFO, pop returns the next word of its source FIFO (both stall while
+ * the FIFO is full/empty), so N operands and M results are N pushes and M pops back to back.
+ * Expands to cfu_op_hw(), include cfu.h.
+ */
+#define CXU_STREAM_PUSH 7
+#define CXU_STREAM_POP  6
+
+#define cxu_stream_push(word) ((void)cfu_op_hw(CXU_STREAM_PUSH, 0, (word), 0))
+#define cxu_stream_pop()      ((uint32_t)cfu_op_hw(CXU_STREAM_POP, 0, 0, 0))
 
 #endif